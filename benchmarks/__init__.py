@@ -0,0 +1 @@
+# benchmarks for qpc, see run.py
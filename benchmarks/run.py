@@ -0,0 +1,209 @@
+# Times each phase of a qpc run on a synthetic workspace, and writes the results as json
+# so runs on different commits can be compared
+#
+# python -m benchmarks.run [--out results.json] [--repeat R] [--projects N ...] [--qpc-args ...]
+#
+# every repeat is a separate process, so nothing cached at module level carries over between them
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import platform
+import subprocess
+import contextlib
+from time import perf_counter
+
+QPC_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if QPC_ROOT not in sys.path:
+    sys.path.insert(0, QPC_ROOT)
+
+from benchmarks.workspace import generate_workspace, add_workspace_args
+
+
+DEFAULT_PLATFORMS = ("linux", "windows")
+DEFAULT_REPEAT = 3
+MASTER_FILE_NAME = "master"
+
+
+class PhaseTimer:
+    def __init__(self):
+        self.phases = {}
+
+    @contextlib.contextmanager
+    def time(self, phase: str):
+        start_time = perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.setdefault(phase, []).append(perf_counter() - start_time)
+
+    def get_results(self) -> dict:
+        return {phase: {"total": sum(times), "count": len(times)} for phase, times in self.phases.items()}
+
+
+# runs qpc on the workspace once, in this process, and returns the time for each phase
+def run_worker(workspace: str, base_file: str, platforms: list, qpc_args: list) -> dict:
+    import qpc
+    import qpc_hash
+    import qpc_cache
+    from qpc_args import args, parse_args
+    from qpc_parser import Parser
+    from qpc_generator_handler import GeneratorHandler
+
+    generator_handler = GeneratorHandler()
+    sys.argv = ["qpc.py", "-d", workspace, "-b", base_file, "-a", "all", "-mf", MASTER_FILE_NAME, "-p", *platforms,
+                *qpc_args]
+    parse_args(generator_handler.get_generator_args())
+    generator_handler.post_args_init()
+    qpc_hash.post_args_init()
+    qpc_cache.post_args_init()
+    qpc.GENERATOR_HANDLER = generator_handler
+
+    # keep the hashes with the workspace, instead of mixing them in with the hashes of real projects
+    qpc_hash.QPC_HASH_DIR = f"{workspace}/_qpc_hashes/"
+    os.makedirs(qpc_hash.QPC_HASH_DIR, exist_ok=True)
+
+    timer = PhaseTimer()
+    parser = Parser()
+
+    with timer.time("parse_base_info"):
+        info = parser.parse_base_info(args.base_file)
+
+    generator_list = qpc.get_generators_all()
+
+    for project_def in info.projects:
+        project_script = project_def.path
+        valid_generators = qpc.get_generators(project_def.platforms, generator_list)
+        if not valid_generators:
+            continue
+
+        with timer.time("parse_project"):
+            project = parser.parse_project(project_def, project_script, info, valid_generators)
+
+        for generator in valid_generators:
+            with timer.time(f"create_project.{generator.filename}"):
+                generator.create_project(project)
+
+        info.add_project_dependencies(project_script, project.dependencies)
+        with timer.time("write_project_hash"):
+            qpc_hash.write_project_hash(project_script, project, valid_generators)
+        info.project_hashes[project_script] = qpc_hash.get_hash_file_path(project_script)
+
+    [generator.projects_finished() for generator in generator_list]
+
+    for generator in generator_list:
+        if generator.generates_master_file():
+            file_path = generator.get_master_file_path(args.master_file)
+            with timer.time(f"create_master_file.{generator.filename}"):
+                generator.create_master_file(info, file_path)
+
+    # nothing changed since the hashes were written, so this is the path taken on a run with nothing to do
+    qpc_hash.CHECKED_HASHES.clear()
+    valid_hashes = 0
+    for project_def in info.projects:
+        with timer.time("check_hash"):
+            valid_hashes += qpc_hash.check_hash(project_def.path)
+
+    qpc_cache.PARSE_CACHE.finish()
+
+    results = timer.get_results()
+    results["check_hash"]["valid"] = valid_hashes
+    return results
+
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=QPC_ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run_repeat(workspace: str, base_file: str, platforms: list, qpc_args: list) -> dict:
+    command = [sys.executable, "-m", "benchmarks.run", "--worker", workspace, base_file,
+               "--platforms", *platforms, "--qpc-args", *qpc_args]
+    output = subprocess.run(command, cwd=QPC_ROOT, capture_output=True, text=True)
+    if output.returncode != 0:
+        sys.stderr.write(output.stderr)
+        raise RuntimeError("benchmark worker failed")
+    return json.loads(output.stdout.splitlines()[-1])
+
+
+def combine_repeats(repeats: list) -> dict:
+    phases = {}
+    for results in repeats:
+        for phase, result in results.items():
+            phase_results = phases.setdefault(phase, {"count": result["count"], "runs": []})
+            phase_results["runs"].append(result["total"])
+            if "valid" in result:
+                phase_results["valid"] = result["valid"]
+
+    for phase_results in phases.values():
+        phase_results["best"] = min(phase_results["runs"])
+    return phases
+
+
+def print_results(phases: dict) -> None:
+    width = max(len(phase) for phase in phases)
+    for phase, results in sorted(phases.items()):
+        print(f"{phase.ljust(width)}  {results['best']:9.4f}s  ({results['count']} calls)")
+
+
+def main():
+    cmd_parser = argparse.ArgumentParser(description="Time each phase of qpc on a synthetic workspace")
+    cmd_parser.add_argument("--out", "-o", help="Write the results to this json file")
+    cmd_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Number of runs, the best time is used")
+    cmd_parser.add_argument("--workspace", help="Write the workspace here and keep it, instead of a temp directory")
+    cmd_parser.add_argument("--platforms", nargs="+", default=DEFAULT_PLATFORMS, help="Platforms passed to qpc")
+    cmd_parser.add_argument("--qpc-args", dest="qpc_args", nargs=argparse.REMAINDER, default=[],
+                            help="Any other arguments are passed to qpc, like --generators or --parsecache")
+    cmd_parser.add_argument("--worker", nargs=2, metavar=("WORKSPACE", "BASE_FILE"), help=argparse.SUPPRESS)
+    add_workspace_args(cmd_parser)
+    bench_args = cmd_parser.parse_args()
+
+    if bench_args.worker:
+        # qpc prints a lot, the only thing this should output is the results
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            results = run_worker(*bench_args.worker, bench_args.platforms, bench_args.qpc_args)
+        print(json.dumps(results))
+        return
+
+    workspace = bench_args.workspace or tempfile.mkdtemp(prefix="qpc_bench_")
+    workspace = os.path.abspath(workspace).replace("\\", "/")
+    try:
+        base_file = generate_workspace(workspace, bench_args.projects, bench_args.files,
+                                       bench_args.configs, bench_args.includes)
+        repeats = [run_repeat(workspace, base_file, bench_args.platforms, bench_args.qpc_args)
+                   for _ in range(bench_args.repeat)]
+    finally:
+        if not bench_args.workspace:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    phases = combine_repeats(repeats)
+    print_results(phases)
+
+    if bench_args.out:
+        results = {
+            "commit": get_commit(),
+            "python": platform.python_version(),
+            "platform": sys.platform,
+            "workspace": {
+                "projects": bench_args.projects,
+                "files": bench_args.files,
+                "configs": bench_args.configs,
+                "includes": bench_args.includes,
+            },
+            "platforms": list(bench_args.platforms),
+            "qpc_args": bench_args.qpc_args,
+            "repeat": bench_args.repeat,
+            "phases": phases,
+        }
+        with open(bench_args.out, mode="w", encoding="utf-8") as out_file:
+            json.dump(results, out_file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+# Writes a synthetic qpc workspace to benchmark with
+# nothing in it is meant to be built, the source files are empty, so no compilers or build tools are needed
+#
+# python -m benchmarks.workspace <out_dir> [--projects N] [--files M] [--configs K] [--includes I]
+
+import os
+import argparse
+
+
+BASE_FILE = "_qpc_scripts/_default.qpc_base"
+PROJECTS_BASE_FILE = "_qpc_scripts/projects.qpc_base"
+
+DEFAULT_PROJECTS = 50
+DEFAULT_FILES = 40
+DEFAULT_CONFIGS = 2
+DEFAULT_INCLUDES = 2
+
+# projects are split into groups of this size, to have some nested folders and contained groups to parse
+GROUP_SIZE = 10
+
+
+def get_config_names(configs: int) -> list:
+    names = ["Debug", "Release"]
+    return names[:configs] + [f"Config{index}" for index in range(len(names), configs)]
+
+
+def get_project_name(index: int) -> str:
+    return f"proj_{index:04}"
+
+
+def get_project_script(index: int) -> str:
+    name = get_project_name(index)
+    return f"projects/{name}/{name}.qpc"
+
+
+def _write(path: str, text: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, mode="w", encoding="utf-8", newline="\n") as file:
+        file.write(text)
+
+
+def _gen_base_file(projects: int, configs: int) -> str:
+    base_file = "// generated by benchmarks/workspace.py\n"
+    base_file += "macro SRCDIR \".\"\n"
+    base_file += "macro BENCH_LEVEL \"2\"  [$WINDOWS || $LINUX]\n\n"
+
+    base_file += "configurations\n{\n"
+    for config in get_config_names(configs):
+        base_file += f"\t\"{config}\"\n"
+    base_file += "}\n\n"
+
+    base_file += f"include \"{PROJECTS_BASE_FILE}\"\n\n"
+
+    for group_index, start in enumerate(range(0, projects, GROUP_SIZE)):
+        base_file += f"group \"group_{group_index}\" \"all\"\n{{\n"
+        base_file += f"\tfolder \"Group {group_index}\"\n\t{{\n"
+        for index in range(start, min(start + GROUP_SIZE, projects)):
+            if index % 3 == 0:
+                base_file += f"\t\tfolder \"Sub\"\n\t\t{{\n\t\t\t\"{get_project_name(index)}\"\n\t\t}}\n"
+            else:
+                base_file += f"\t\t\"{get_project_name(index)}\"\n"
+        base_file += "\t}\n}\n\n"
+
+    return base_file
+
+
+def _gen_projects_base_file(projects: int) -> str:
+    base_file = ""
+    for index in range(projects):
+        base_file += f"project \"{get_project_name(index)}\" \"{get_project_script(index)}\""
+        if index % 4 == 1:
+            base_file += "  [$WINDOWS || $LINUX]"
+        elif index % 4 == 2:
+            base_file += "  [!$MACOS && ($POSIX || $WINDOWS)]"
+        base_file += "\n"
+    return base_file
+
+
+def _gen_include_file(index: int) -> str:
+    return f"""macro INCLUDE_{index}_DIR "$ROOT_DIR/include/{index}"
+
+configuration
+{{
+	general
+	{{
+		include_directories
+		{{
+			"$SRCDIR/public"
+			"$INCLUDE_{index}_DIR"  [$WINDOWS]
+			"$INCLUDE_{index}_DIR/posix"  [$POSIX && ($BENCH_LEVEL >= 2 || $DEBUG)]
+		}}
+	}}
+
+	compiler
+	{{
+		preprocessor_definitions
+		{{
+			"INCLUDE_{index}=1"
+			"CONFIG_$CONFIG"
+			"INCLUDE_{index}_DEBUG"  [$CONFIG == Debug]
+			"INCLUDE_{index}_NESTED"  [($WINDOWS || $LINUX) && !($CONFIG == Release)]
+		}}
+	}}
+}}
+"""
+
+
+def _gen_project_script(index: int, files: int, includes: int) -> str:
+    script = "macro OUTBIN \"$ROOT_DIR/bin\"\n"
+    script += f"macro PROJ_LEVEL \"{index % 5}\"\n"
+    for include in range(includes):
+        script += f"include \"$ROOT_DIR/_qpc_scripts/include_{include}.qpc_include\"\n"
+
+    if index % 10 == 9:
+        config_type = "application"
+    elif index % 2:
+        config_type = "dynamic_library"
+    else:
+        config_type = "static_library"
+
+    script += f"""
+configuration
+{{
+	general
+	{{
+		out_dir "$OUTBIN"
+		configuration_type "{config_type}"
+		language "cpp"
+	}}
+
+	compiler
+	{{
+		preprocessor_definitions
+		{{
+			"PROJ_{index}"
+			"LEVEL_$PROJ_LEVEL"  [$LINUX]
+			"HIGH_LEVEL"  [$PROJ_LEVEL >= 3 && ($WINDOWS || $POSIX)]
+		}}
+		options
+		{{
+			"-O2"  [$CONFIG == Release]
+		}}
+	}}
+
+	linker
+	{{
+		libraries
+		{{
+			"m"  [$POSIX]
+		}}
+	}}
+}}
+"""
+
+    if index:
+        script += "\ndependencies\n{\n"
+        for dependency in range(max(0, index - 3), index):
+            script += f"\t\"{get_project_script(dependency)}\"\n"
+        script += "}\n"
+
+    # half the source files are globbed, the other half are listed
+    script += "\nfiles\n{\n\tfolder \"Source Files\"\n\t{\n\t\t\"src/glob/*.cpp\"\n"
+    for file in range(files // 2, files):
+        script += f"\t\t\"src/file_{file:04}.cpp\""
+        if file % 7 == 0:
+            script += "  [$WINDOWS || ($LINUX && !$MACOS)]"
+        script += "\n"
+    script += "\t\t\"src/special.cpp\"\n\t\t{\n\t\t\tpreprocessor_definitions { \"SPECIAL\" }\n\t\t}\n"
+    script += "\t}\n\n\tfolder \"Header Files\"\n\t{\n"
+    for file in range(0, files, 4):
+        script += f"\t\t\"src/file_{file:04}.h\"\n"
+    script += "\t}\n\n\t- \"src/glob/file_0000.cpp\"  [$POSIX]\n}\n"
+
+    return script
+
+
+def _gen_project_files(project_dir: str, files: int) -> None:
+    for file in range(files):
+        if file < files // 2:
+            _write(f"{project_dir}/src/glob/file_{file:04}.cpp", "")
+        else:
+            _write(f"{project_dir}/src/file_{file:04}.cpp", "")
+        if file % 4 == 0:
+            _write(f"{project_dir}/src/file_{file:04}.h", "")
+    _write(f"{project_dir}/src/special.cpp", "")
+
+
+# returns the path to the base file, relative to out_dir
+def generate_workspace(out_dir: str, projects: int = DEFAULT_PROJECTS, files: int = DEFAULT_FILES,
+                       configs: int = DEFAULT_CONFIGS, includes: int = DEFAULT_INCLUDES) -> str:
+    _write(f"{out_dir}/{BASE_FILE}", _gen_base_file(projects, configs))
+    _write(f"{out_dir}/{PROJECTS_BASE_FILE}", _gen_projects_base_file(projects))
+
+    for include in range(includes):
+        _write(f"{out_dir}/_qpc_scripts/include_{include}.qpc_include", _gen_include_file(include))
+
+    for index in range(projects):
+        script = get_project_script(index)
+        _write(f"{out_dir}/{script}", _gen_project_script(index, files, includes))
+        _gen_project_files(f"{out_dir}/{os.path.dirname(script)}", files)
+
+    return BASE_FILE
+
+
+def add_workspace_args(cmd_parser: argparse.ArgumentParser) -> None:
+    cmd_parser.add_argument("--projects", type=int, default=DEFAULT_PROJECTS, help="Number of project scripts")
+    cmd_parser.add_argument("--files", type=int, default=DEFAULT_FILES, help="Source files per project")
+    cmd_parser.add_argument("--configs", type=int, default=DEFAULT_CONFIGS, help="Number of configurations")
+    cmd_parser.add_argument("--includes", type=int, default=DEFAULT_INCLUDES, help="Include files used by each project")
+
+
+def main():
+    cmd_parser = argparse.ArgumentParser(description="Write a synthetic qpc workspace")
+    cmd_parser.add_argument("out_dir", help="Directory to write the workspace to")
+    add_workspace_args(cmd_parser)
+    bench_args = cmd_parser.parse_args()
+
+    base_file = generate_workspace(bench_args.out_dir, bench_args.projects, bench_args.files,
+                                   bench_args.configs, bench_args.includes)
+    print(f"Wrote workspace to \"{bench_args.out_dir}\", base file \"{base_file}\"")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,9 @@
-import os
 import json
 
-from qpc_base import BaseProjectGenerator, Platform, create_directory
+from qpc_base import BaseProjectGenerator, Platform
 from qpc_project import ConfigType, Language, ProjectContainer, ProjectPass, Configuration
 from qpc_logging import warning, error, verbose, print_color, Color
+import qpc_hash
 from ..shared import cmd_line_gen
 
 
@@ -26,19 +26,36 @@ class CompileCommandsGenerator(BaseProjectGenerator):
         if not self.commands_list:
             return
         print("------------------------------------------------------------------------")
-        create_directory("compile_commands")
+        root_paths = qpc_hash.get_root_paths()
+        root_paths.create_directory("compile_commands")
         for label, commands_list in self.commands_list.items():
             print_color(Color.CYAN, "Writing: " + f"compile_commands/{label}.json")
             compile_commands = json.dumps(commands_list, indent=4)
-            with open(f"compile_commands/{label}.json", "w") as file_io:
+            with open(root_paths.path(f"compile_commands/{label}.json"), "w") as file_io:
                 file_io.write(compile_commands)
     
+    def pop_project_state(self):
+        commands_list = self.commands_list
+        self.commands_list = {}
+        self.all_files = {}
+        return commands_list
+    
+    def merge_project_state(self, commands_list: dict) -> None:
+        for label, commands in commands_list.items():
+            all_files = self.all_files.setdefault(label, set())
+            label_commands = self.commands_list.setdefault(label, [])
+            for command in commands:
+                if command["file"] not in all_files:
+                    all_files.add(command["file"])
+                    label_commands.append(command)
+    
     def create_project(self, project: ProjectContainer) -> None:
         project_passes = self._get_passes(project)
         if not project_passes:
             return
 
         print_color(Color.CYAN, "Adding to Compile Commands: " + project.file_name)
+        self.cmd_gen.set_paths(project.paths)
         
         for proj_pass in project_passes:
             self.cmd_gen.set_mode(proj_pass.config.general.compiler)
@@ -55,7 +72,7 @@ class CompileCommandsGenerator(BaseProjectGenerator):
             
     def handle_file(self, file: str, project: ProjectPass) -> dict:
         file_dict = {
-            "directory": os.getcwd().replace("\\", "/"),
+            "directory": project.container.paths.dir.replace("\\", "/"),
             "command": cmd_line_gen.get_compiler(project.config.general.compiler, project.config.general.language) + " ",
             "file": file
         }
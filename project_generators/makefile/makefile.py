@@ -44,7 +44,7 @@ class MakefileGenerator(BaseProjectGenerator):
         for p in project_passes:
             makefile += gen_project_config_definitions(p)
         
-        with open(project.file_name + MAKEFILE_EXT, "w", encoding="utf-8") as f:
+        with open(project.paths.path(project.file_name + MAKEFILE_EXT), "w", encoding="utf-8") as f:
             f.write(makefile)
 
     def does_project_exist(self, project_out_dir: str) -> bool:
@@ -62,7 +62,7 @@ class MakefileGenerator(BaseProjectGenerator):
         for project_def in wanted_projects:
             out_dir = qpc_hash.get_out_dir(info.project_hashes[project_def.path])
             if out_dir:
-                out_dir_dict[project_def.path] = os.path.relpath(out_dir)
+                out_dir_dict[project_def.path] = os.path.relpath(out_dir, info.paths.dir)
                 dependency_dict[project_def.path] = info.project_dependencies[project_def.path]
 
         # this chooses 64 bit architectures over 32 bit for a default arch
@@ -84,7 +84,7 @@ all:
         for index, path in enumerate(make_paths):
             master_file += f"\tmake -C {path} -f {make_files[index]} $(SETTINGS)\n"
 
-        with open(master_file_path, "w") as master_file_w:
+        with open(info.paths.path(master_file_path), "w") as master_file_w:
             master_file_w.write(master_file + "\n")
     
     def does_master_file_exist(self, master_file_path: str) -> bool:
@@ -1,10 +1,10 @@
 import sys
-import os
 
-from qpc_base import BaseProjectGenerator, Platform, create_directory
+from qpc_base import BaseProjectGenerator, Platform, PathContext
 from qpc_project import ConfigType, Language, ProjectContainer, ProjectPass, Configuration, General, SourceFileCompile
 from qpc_parser import BaseInfo
 from qpc_logging import warning, error, verbose, print_color, Color, verbose_color
+import qpc_hash
 from ..shared.cmd_line_gen import get_compiler, Mode
 from ..shared import cmd_line_gen
 from ..shared import msvc_tools
@@ -31,7 +31,8 @@ class NinjaGenerator(BaseProjectGenerator):
         if not self.commands_list:
             return
         print("------------------------------------------------------------------------")
-        create_directory("build_ninja")
+        root_paths = qpc_hash.get_root_paths()
+        root_paths.create_directory("build_ninja")
         for label, commands_list in self.commands_list.items():
             print_color(Color.CYAN, "Writing: " + f"build_ninja/{label}.ninja")
             script = self.gen_rules()
@@ -46,7 +47,7 @@ class NinjaGenerator(BaseProjectGenerator):
                         commands_list[commands_list.index(command)] = "\n".join(new_command)
             
             script += '\n\n'.join(commands_list)
-            with open(f"build_ninja/{label}.ninja", "w") as file_io:
+            with open(root_paths.path(f"build_ninja/{label}.ninja"), "w") as file_io:
                 file_io.write(script)
     
     def get_dependencies(self, label: str, dep_list: list) -> list:
@@ -56,6 +57,23 @@ class NinjaGenerator(BaseProjectGenerator):
                 output_list.append(self.output_files[label][dep][0])
         return output_list
     
+    def pop_project_state(self):
+        state = (self.commands_list, self.output_files, self.dependencies)
+        self.commands_list = {}
+        self.all_files = {}
+        self.output_files = {}
+        self.dependencies = {}
+        return state
+    
+    def merge_project_state(self, state: tuple) -> None:
+        commands_list, output_files, dependencies = state
+        for label, commands in commands_list.items():
+            self.all_files.setdefault(label, set())
+            self.commands_list.setdefault(label, []).extend(commands)
+        for label, label_output_files in output_files.items():
+            self.output_files.setdefault(label, {}).update(label_output_files)
+        self.dependencies.update(dependencies)
+    
     def create_project(self, project: ProjectContainer) -> None:
         project_passes = self._get_passes(project)
         if not project_passes:
@@ -64,6 +82,7 @@ class NinjaGenerator(BaseProjectGenerator):
         proj_name = project.file_name.replace('.', '_').replace(':', '$')
         
         print_color(Color.CYAN, "Adding to Ninja: " + project.file_name)
+        self.cmd_gen.set_paths(project.paths)
             
         if project.dependencies:
             self.dependencies[project.project_path] = project.dependencies.copy()
@@ -142,16 +161,16 @@ rule so_msvc
         # {proj_name}_build_dir = {abs_path(conf.general.build_dir)}
         return f"""#!/usr/bin/env ninja -f
 # variables
-{proj_name}_src_dir = {os.getcwd()}
+{proj_name}_src_dir = {project.paths.dir}
 out_file = {outname}
 {proj_name}_compiler = {compiler}
-{proj_name}_build_dir = {os.path.abspath(conf.general.build_dir)}
+{proj_name}_build_dir = {project.paths.abspath(conf.general.build_dir)}
 
 build ${proj_name}_build_dir: mkdir ${proj_name}_build_dir
 """
     
     def get_file_build_path(self, proj_name: str, general: General, file: str):
-        return os.path.abspath(self.cmd_gen.get_file_build_path(general, file)).replace(':', '$:')
+        return self.cmd_gen.paths.abspath(self.cmd_gen.get_file_build_path(general, file)).replace(':', '$:')
         # return f"${proj_name}_src_dir/{self.cmd_gen.get_file_build_path(general, file)}"
     
     @staticmethod
@@ -165,7 +184,7 @@ build ${proj_name}_build_dir: mkdir ${proj_name}_build_dir
     
     def get_output_file(self, project: ProjectPass):
         target_name = project.config.linker.output_file if project.config.linker.output_file else project.config.general.out_name
-        return f"{abs_path(target_name)}{self.get_target_type_ext(project)[1]}"
+        return f"{abs_path(project.container.paths, target_name)}{self.get_target_type_ext(project)[1]}"
 
     # TODO: handle dependencies
     def handle_target(self, project: ProjectPass, proj_name: str, source_files) -> str:
@@ -187,9 +206,8 @@ build ${proj_name}_build_dir: mkdir ${proj_name}_build_dir
 
     # Build definition for file
     def handle_file(self, file: str, file_compile: SourceFileCompile, proj: ProjectPass, proj_name: str) -> str:
-        # print(os.getcwd(), project)
         build_path = self.get_file_build_path(proj_name, proj.config.general, file)
-        cmd = f"build {build_path}: cc_{self.cmd_gen.mode.name.lower()} {abs_path(file)}\n"
+        cmd = f"build {build_path}: cc_{self.cmd_gen.mode.name.lower()} {abs_path(proj.container.paths, file)}\n"
         cmd += f"    cflags = {add_escapes(self.cmd_gen.file_compile_flags(proj.config, file_compile))}\n"
         cmd += f"    compiler = ${proj_name}_compiler\n"
         return cmd
@@ -199,6 +217,6 @@ def add_escapes(string: str) -> str:
     return string.replace('$', '$$').replace(':', '$:')
 
 
-def abs_path(path: str) -> str:
-    return add_escapes(os.path.abspath(path))
+def abs_path(paths: PathContext, path: str) -> str:
+    return add_escapes(paths.abspath(path))
 
@@ -1,5 +1,6 @@
 import os
 from enum import Enum, auto
+from qpc_base import PathContext
 from qpc_project import (Language, Configuration, Compile, Linker, General,
                          SourceFile, SourceFileCompile, ProjectPass, PrecompiledHeader)
 from qpc_logging import warning
@@ -25,8 +26,14 @@ class CommandLineGen:
         self.switch = None
         self._char_inc_dir = None
         self._char_define = None
+        # relative paths are made absolute from here, see set_paths()
+        self.paths = None
         self.set_mode(mode)
     
+    # set to ProjectContainer.paths before converting anything for a project
+    def set_paths(self, paths: PathContext):
+        self.paths = paths
+    
     def set_mode(self, mode: str):
         if mode and mode != self._compiler:
             self._compiler = mode
@@ -109,7 +116,7 @@ class CommandLineGen:
                 
     def convert_includes(self, include_paths: list) -> list:
         converted_paths = []
-        [converted_paths.append(f"{self._char_inc_dir}\"{os.path.abspath(path)}\"") for path in include_paths]
+        [converted_paths.append(f"{self._char_inc_dir}\"{self.paths.abspath(path)}\"") for path in include_paths]
         return converted_paths
     
     @staticmethod
@@ -118,10 +125,9 @@ class CommandLineGen:
         [converted_paths.append(f"{char}{item}") for item in items]
         return converted_paths
     
-    @staticmethod
-    def convert_char_abs(char: str, items: list) -> list:
+    def convert_char_abs(self, char: str, items: list) -> list:
         converted_paths = []
-        [converted_paths.append(f"{char}\"{os.path.abspath(item)}\"") for item in items]
+        [converted_paths.append(f"{char}\"{self.paths.abspath(item)}\"") for item in items]
         return converted_paths
     
     @staticmethod
@@ -156,7 +162,7 @@ class CommandLineGen:
             return ""
         
         if self.mode == Mode.MSVC:
-            return f"/IMPLIB:\"{os.path.abspath(os.path.splitext(lib)[0])}.lib\""
+            return f"/IMPLIB:\"{self.paths.abspath(os.path.splitext(lib)[0])}.lib\""
         
         # does clang or gcc have an import library option?
         
@@ -218,7 +224,7 @@ class CommandLineGen:
             return ""
     
         if self.mode == Mode.MSVC:
-            return f"/Fp\"{os.path.abspath(os.path.splitext(path)[0])}.pch\""
+            return f"/Fp\"{self.paths.abspath(os.path.splitext(path)[0])}.pch\""
     
         return ""
         
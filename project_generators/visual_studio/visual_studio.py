@@ -118,7 +118,7 @@ class VisualStudioGenerator(BaseProjectGenerator):
                 
         info_win = info.get_base_info(Platform.WINDOWS)
     
-        with open(master_file_path, "w", encoding="utf-8") as self.solution_file:
+        with open(info.paths.path(master_file_path), "w", encoding="utf-8") as self.solution_file:
             write_solution_header(self.solution_file)
 
             self.project_uuid_dict = {}
@@ -1014,26 +1014,15 @@ def create_item_group_filters(proj_filters, files_dict, filter_name):
             folder.text = folder_path.replace("/", "\\")
 
 
-def create_directory(directory: str) -> None:
-    try:
-        os.makedirs(directory)
-        if args.verbose:
-            print("Created Directory: " + directory)
-    except FileExistsError:
-        pass
-    except FileNotFoundError:
-        pass
-
-
 def write_project(project: ProjectContainer, out_dir: str, xml_file: et.Element, ext: str) -> None:
     if out_dir and not out_dir.endswith("/"):
         out_dir += "/"
     file_path = out_dir + os.path.splitext(project.file_name)[0] + ext
         
     # directory = os.path.split(file_path)
-    create_directory(out_dir)
+    project.paths.create_directory(out_dir)
     
-    with open(file_path, "w", encoding="utf-8") as project_file:
+    with open(project.paths.path(file_path), "w", encoding="utf-8") as project_file:
         project_file.write(xml_to_string(xml_file))
 
 
@@ -1045,7 +1034,7 @@ def xml_to_string(elem) -> str:
 
 
 def create_vcxproj_user(project: ProjectContainer, project_passes: list) -> et.Element:
-    file_path = os.path.splitext(project.file_name)[0] + ".vcxproj.user"
+    file_path = project.paths.path(os.path.splitext(project.file_name)[0] + ".vcxproj.user")
     if os.path.isfile(file_path):
         vcxproj = et.parse(file_path).getroot()
     else:
@@ -5,18 +5,26 @@
 
 import os
 import sys
+import multiprocessing
 
+from io import StringIO
 from time import perf_counter
 from enum import Enum
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
 
 import qpc_reader
 from qpc_generator_handler import GeneratorHandler
 from qpc_parser import Parser, ProjectDefinition
 from qpc_args import args, parse_args
-from qpc_base import BaseProjectGenerator, create_directory, Platform, Arch
+from qpc_base import BaseProjectGenerator, create_directory, clear_glob_cache, timer_diff, Platform, Arch
 import qpc_logging
 
 import qpc_hash
+import qpc_cache
+import qpc_profile
+import qpc_watch
+from qpc_profile import PROFILE
 
 
 PRINT_LINE = "------------------------------------------------------------------------"
@@ -63,8 +71,9 @@ def check_platforms(platform_list: set, generator_platforms: list) -> set:
 
 def get_generator_need_rebuild(project_script: str, generator_list: list) -> list:
     generators = []
+    project_path = qpc_hash.get_root_paths().path(project_script)
     for generator in generator_list:
-        if not generator.does_project_exist(project_script):
+        if not generator.does_project_exist(project_path):
             generators.append(generator)
     return generators
 
@@ -97,25 +106,79 @@ def should_call_create_master_file(file_path: str, info, generator: BaseProjectG
     if args.force_master:
         return True
     if file_path:
-        if not os.path.isfile(file_path):
+        if not qpc_hash.get_root_paths().isfile(file_path):
             return True
         if not qpc_hash.check_master_file_hash(file_path, info, generator, hashes):
             return True
     return False
 
 
-def main():
-    create_directory(qpc_hash.QPC_HASH_DIR)
-    os.chdir(args.root_dir)
+# returns the generators that need to create this project, or None if it's up to date
+def get_project_rebuild(project_script: str, valid_generators: list):
+    generators_rebuild = get_generator_need_rebuild(project_script, valid_generators)
+    if not generators_rebuild and not should_build_project(project_script, valid_generators):
+        return None
     
-    parser = Parser()
-    
-    info = parser.parse_base_info(args.base_file)
-    generator_list = get_generators_all()
+    rebuild_info = qpc_hash.get_rebuild_info(project_script, generators_rebuild)
+    if args.force or rebuild_info["rebuild_all"]:
+        return valid_generators
     
-    if args.time:
-        start_time = perf_counter()
+    # does any generator need to rebuild? the hash check adds the ones with a changed generator module,
+    # and get_rebuild_info() adds the ones with missing output, so both are in rebuild_info["generators"]
+    project_filename = os.path.split(project_script)[1]
+    create_generators = [generator for generator in valid_generators
+                         if generator_needs_rebuild(project_filename, generator, rebuild_info)]
     
+    # nothing to create, so it's treated like it's up to date, and the last hash and dependencies are kept
+    return create_generators or None
+
+
+# only the passes for create_generators are parsed, the rest of the hash is kept from the last time it was written
+# if there's nothing to create, it isn't parsed and the hash and dependencies from the last time are kept
+def build_project(parser: Parser, info, project_def: ProjectDefinition, valid_generators: list, create_generators: list):
+    if not create_generators:
+        return None
+    project_script = project_def.path
+    with PROFILE.use_project(project_script):
+        with PROFILE.phase("parse"):
+            project = parser.parse_project(project_def, project_script, info, create_generators)
+        if project and len(create_generators) < len(valid_generators):
+            qpc_hash.add_previous_hash(project_script, project)
+        if project:
+            for generator in create_generators:
+                with PROFILE.phase("create_project." + generator.filename):
+                    generator.create_project(project)
+            with PROFILE.phase("write_hash"):
+                qpc_hash.write_project_hash(project_script, project, valid_generators)
+    return project
+
+
+def pop_project_states(generators: list) -> dict:
+    return {generator.filename: generator.pop_project_state() for generator in generators}
+
+
+# --watch: what each generator got from each project is kept here instead of in the generators,
+# so projects that didn't change don't need to be created again, see merge_project_states()
+# generator_states is None if the project couldn't be parsed
+def keep_project_states(project_states: dict, project_script: str, generator_states: dict) -> None:
+    if generator_states is None:
+        project_states.pop(project_script, None)
+    else:
+        project_states.setdefault(project_script, {}).update(generator_states)
+
+
+# merged in the order of the projects, so the output is the same as creating all of them at once
+def merge_project_states(info, generator_list: list, project_states: dict) -> None:
+    for project_def in info.projects:
+        generator_states = project_states.get(project_def.path, {})
+        for generator in generator_list:
+            if generator.filename in generator_states:
+                generator.merge_project_state(generator_states[generator.filename])
+
+
+# changed_projects: only check these projects, the rest are kept from the last run in project_states
+def build_projects(parser: Parser, info, generator_list: list, project_states: dict = None,
+                   changed_projects: set = None) -> None:
     for project_def in info.projects:
         project_script = project_def.path
         
@@ -124,47 +187,162 @@ def main():
         if not valid_generators:
             continue
         
+        if changed_projects is not None and project_script not in changed_projects:
+            continue
+        
         if not args.skip_projects:
             print()
 
-        generators_rebuild = get_generator_need_rebuild(project_script, valid_generators)
-        if generators_rebuild or should_build_project(project_script, valid_generators):
-            rebuild_info = qpc_hash.get_rebuild_info(project_script, generators_rebuild)
-
-            project_dir, project_filename = os.path.split(project_script)
-
-            if project_dir and project_dir != args.root_dir:
-                os.chdir(project_dir)
-
-            project = parser.parse_project(project_def, project_script, info, valid_generators)
+        with PROFILE.use_project(project_script):
+            create_generators = get_project_rebuild(project_script, valid_generators)
+        if create_generators is not None:
+            project = build_project(parser, info, project_def, valid_generators, create_generators)
+            if project_states is not None:
+                keep_project_states(project_states, project_script,
+                                    pop_project_states(create_generators) if project else None)
             if not project:
                 continue
-
-            if args.force or rebuild_info["rebuild_all"]:
-                [generator.create_project(project) for generator in valid_generators]
-            else:
-                # does any generator need to rebuild?
-                for generator in generators_rebuild:
-                    if generator_needs_rebuild(project_filename, generator, rebuild_info):
-                        generator.create_project(project)
-
-            if project_dir and project_dir != args.root_dir:
-                os.chdir(args.root_dir)
-
             info.add_project_dependencies(project_script, project.dependencies)
-            qpc_hash.write_project_hash(project_script, project, valid_generators)
-            
         else:
             info.add_project_dependencies(project_script, qpc_hash.get_project_dependencies(project_script))
             
         info.project_hashes[project_script] = qpc_hash.get_hash_file_path(project_script)
 
+
+# --jobs: checking hashes is done here, and projects that need rebuilding are parsed and created in worker processes
+# everything a worker adds to the generators and base info is sent back and merged in the order of the projects,
+# so the output is the same as building them one at a time
+def build_projects_parallel(parser: Parser, info, generator_list: list, project_states: dict = None) -> None:
+    # spawn, so workers don't inherit the prefetch threads or anything set up after startup
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(args.jobs, context, _init_worker, (vars(args).copy(),)) as pool:
+        builds = []
+        for project_def in info.projects:
+            valid_generators = get_generators(project_def.platforms, generator_list)
+            if not valid_generators:
+                continue
+            
+            # hold onto anything printed here, so it's printed in order with the output of the workers
+            with redirect_stdout(StringIO()) as output:
+                if not args.skip_projects:
+                    print()
+                with PROFILE.use_project(project_def.path):
+                    create_generators = get_project_rebuild(project_def.path, valid_generators)
+                
+            future = None
+            if create_generators is not None:
+                future = pool.submit(_build_project_worker, project_def.path,
+                                     [generator.filename for generator in valid_generators],
+                                     [generator.filename for generator in create_generators])
+            builds.append((project_def.path, output.getvalue(), future))
+        
+        for project_script, output, future in builds:
+            sys.stdout.write(output)
+            if future is None:
+                info.add_project_dependencies(project_script, qpc_hash.get_project_dependencies(project_script))
+                info.project_hashes[project_script] = qpc_hash.get_hash_file_path(project_script)
+                continue
+            
+            output, warning_count, parse_count, exit_code, dependencies, generator_states, profile, file_stats = \
+                future.result()
+            sys.stdout.write(output)
+            qpc_logging.WARNING_COUNT += warning_count
+            parser.counter += parse_count
+            PROFILE.merge_results(profile)
+            qpc_hash.STAT_CACHE.merge_stats(file_stats)
+            
+            # the worker hit an error, stop like it would have without --jobs
+            if exit_code is not None:
+                sys.stdout.flush()
+                pool.shutdown(cancel_futures=True)
+                quit(exit_code)
+            
+            if project_states is not None:
+                keep_project_states(project_states, project_script,
+                                    generator_states if dependencies is not None else None)
+            
+            if dependencies is None:
+                continue
+            
+            if project_states is None:
+                for generator in generator_list:
+                    if generator.filename in generator_states:
+                        generator.merge_project_state(generator_states[generator.filename])
+            
+            info.add_project_dependencies(project_script, dependencies)
+            info.project_hashes[project_script] = qpc_hash.get_hash_file_path(project_script)
+
+
+WORKER_PARSER = None
+WORKER_INFO = None
+WORKER_PROJECTS = {}
+
+
+def _init_worker(arg_values: dict) -> None:
+    global GENERATOR_HANDLER, WORKER_PARSER, WORKER_INFO
+    args.__dict__.update(arg_values)
+    GENERATOR_HANDLER = GeneratorHandler()
+    GENERATOR_HANDLER.post_args_init()
+    qpc_hash.post_args_init()
+    qpc_cache.post_args_init()
+    qpc_profile.post_args_init()
+    
+    WORKER_PARSER = Parser()
+    # anything in the base files was already printed and profiled by the main process
+    with redirect_stdout(StringIO()):
+        WORKER_INFO = WORKER_PARSER.parse_base_info(args.base_file)
+        qpc_logging.WARNING_COUNT = 0
+        PROFILE.pop_results()
+    WORKER_PROJECTS.update({project_def.path: project_def for project_def in WORKER_INFO.projects})
+
+
+# generators are passed by name in the order the main process has them in, which can be different here
+def _build_project_worker(project_script: str, valid_names: list, create_names: list) -> tuple:
+    project_def = WORKER_PROJECTS[project_script]
+    generators = {generator.filename: generator for generator in get_generators_all()}
+    valid_generators = [generators[name] for name in valid_names]
+    create_generators = [generators[name] for name in create_names]
+    
+    warning_count = qpc_logging.WARNING_COUNT
+    parse_count = WORKER_PARSER.counter
+    exit_code = None
+    project = None
+    
+    with redirect_stdout(StringIO()) as output:
+        try:
+            project = build_project(WORKER_PARSER, WORKER_INFO, project_def, valid_generators, create_generators)
+        except SystemExit as exit_error:
+            exit_code = exit_error.code
+    
+    generator_states = pop_project_states(create_generators)
+    return (output.getvalue(), qpc_logging.WARNING_COUNT - warning_count, WORKER_PARSER.counter - parse_count,
+            exit_code, project.dependencies if project else None, generator_states, PROFILE.pop_results(),
+            qpc_hash.STAT_CACHE.pop_new_stats())
+
+
+# creates the projects and master files
+# project_states and changed_projects are for --watch, see build_projects()
+def build_all(parser: Parser, info, generator_list: list, project_states: dict = None,
+              changed_projects: set = None) -> None:
+    if args.time:
+        start_time = perf_counter()
+    
+    if args.jobs > 1 and changed_projects is None:
+        build_projects_parallel(parser, info, generator_list, project_states)
+    else:
+        build_projects(parser, info, generator_list, project_states, changed_projects)
+    
+    if project_states is not None:
+        merge_project_states(info, generator_list, project_states)
+
     if args.time:
         print("\nFinished Parsing Projects"
               "\n\tTime: " + str(round(perf_counter() - start_time, 4)) +
               "\n\tParse Count: " + str(parser.counter))
 
-    [generator.projects_finished() for generator in generator_list]
+    for generator in generator_list:
+        with PROFILE.phase("projects_finished." + generator.filename):
+            generator.projects_finished()
 
     if args.master_file:
         print(PRINT_LINE)
@@ -178,8 +356,98 @@ def main():
             project_hashes = info.get_hashes(*generator_platforms)
             
             if should_call_create_master_file(file_path, info, generator, project_hashes):
-                generator.create_master_file(info, file_path)
+                with PROFILE.phase("master_file." + generator.filename):
+                    generator.create_master_file(info, file_path)
                 qpc_hash.write_master_file_hash(file_path, info, generator.get_supported_platforms(), generator.path)
+    
+    # saved after every run with --watch too, so it's kept if qpc is closed without Ctrl+C
+    qpc_hash.STAT_CACHE.save()
+
+
+# --watch: everything from the last run is kept, and only the projects using files that changed are checked again,
+# if a base file changes, they are parsed again and every project is checked, like running qpc again
+# base_files: absolute paths of the base files, see Parser.read_files
+def watch_projects(parser: Parser, info, generator_list: list, project_states: dict, base_files: list) -> None:
+    watcher = qpc_watch.Watcher()
+    watcher.set_base_files(base_files)
+    watcher.set_projects([project_def.path for project_def in info.projects])
+    # projects that weren't finished because of an error are checked again next time, None for the base files
+    failed_projects = set()
+    
+    print(f"{PRINT_LINE}\nWatching for changes, press Ctrl+C to stop\n{PRINT_LINE}")
+    
+    try:
+        while True:
+            changed_files = watcher.wait()
+            start_time = perf_counter()
+            warning_count = qpc_logging.WARNING_COUNT
+            
+            print(PRINT_LINE)
+            [print("Changed: " + path) for path in sorted(changed_files)]
+            
+            parser.forget_files(changed_files)
+            clear_glob_cache()
+            qpc_hash.CHECKED_HASHES.clear()
+            # everything from the last run was merged into the generators, it's merged again from project_states
+            pop_project_states(generator_list)
+            
+            if failed_projects is None or not watcher.base_files.isdisjoint(changed_files):
+                changed_projects = None
+            else:
+                changed_projects = watcher.get_projects(changed_files) | failed_projects
+            failed_projects = changed_projects
+            
+            try:
+                if changed_projects is None:
+                    new_parser = Parser()
+                    try:
+                        with PROFILE.phase("base_info"):
+                            info = new_parser.parse_base_info(args.base_file)
+                    except SystemExit:
+                        new_parser.close()
+                        raise
+                    parser.close()
+                    parser = new_parser
+                    watcher.set_base_files(parser.read_files)
+                    project_states.clear()
+                
+                build_all(parser, info, generator_list, project_states, changed_projects)
+                failed_projects = set()
+            except SystemExit:
+                pass
+            
+            if changed_projects is None:
+                watcher.set_projects([project_def.path for project_def in info.projects])
+            else:
+                [watcher.set_project(project_script) for project_script in changed_projects]
+            
+            print(f"{PRINT_LINE}\nUpdated in {timer_diff(start_time)} - "
+                  f"{qpc_logging.WARNING_COUNT - warning_count} Warnings\n{PRINT_LINE}")
+    except KeyboardInterrupt:
+        print()
+    
+    parser.close()
+
+
+def main():
+    create_directory(qpc_hash.QPC_HASH_DIR)
+    
+    parser = Parser()
+    
+    with PROFILE.phase("base_info"):
+        info = parser.parse_base_info(args.base_file)
+    base_files = list(parser.read_files)
+    generator_list = get_generators_all()
+    
+    # --watch: generator filename: what it got from the project, for each project script
+    project_states = {} if args.watch is not None else None
+    
+    build_all(parser, info, generator_list, project_states)
+    
+    if args.watch is not None:
+        watch_projects(parser, info, generator_list, project_states, base_files)
+    
+    parser.close()
 
 
 if __name__ == "__main__":
@@ -193,6 +461,10 @@ if __name__ == "__main__":
     parse_args(GENERATOR_HANDLER.get_generator_args())
     GENERATOR_HANDLER.post_args_init()
     qpc_hash.post_args_init()
+    qpc_cache.post_args_init()
+    qpc_profile.post_args_init()
     main()
+    qpc_cache.PARSE_CACHE.finish()
+    PROFILE.finish()
     
     print(f"{PRINT_LINE}\nFinished - {qpc_logging.WARNING_COUNT} Warnings\n{PRINT_LINE}")
@@ -11,6 +11,26 @@ args = argparse.Namespace()
 DEFAULT_BASEFILE = "_qpc_scripts/_default.qpc_base"
 
 
+def positive_float(value: str) -> float:
+    try:
+        number = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid number: '{value}'")
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0: '{value}'")
+    return number
+
+
+def non_negative_int(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid number: '{value}'")
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must be 0 or more: '{value}'")
+    return number
+
+
 # this is here so i can check arguments globally across files
 def parse_args(generators: list) -> None:
     platforms = [platform.name.lower() for platform in Platform]
@@ -37,6 +57,18 @@ def parse_args(generators: list) -> None:
     cmd_parser.add_argument("--hidewarnings", "-w", dest="hide_warnings", action="store_true", help="Suppress all warnings")
     cmd_parser.add_argument("--checkfiles", "-cf", dest="check_files", action="store_true", help="Check if any added file exists")
     cmd_parser.add_argument("--skipprojects", "-sp", dest="skip_projects", action="store_true", help="Don't generate projects")
+    cmd_parser.add_argument("--parsecache", "-pc", dest="parse_cache", nargs="?", type=int, const=128, default=0,
+                            help="Cache parsed scripts between runs, optionally set the max cache size in MB (default 128)")
+    cmd_parser.add_argument("--paranoid-hash", "-ph", dest="paranoid_hash", action="store_true",
+                            help="Read every file to check if it changed, instead of only ones with a different size or modified time")
+    cmd_parser.add_argument("--jobs", "-j", type=non_negative_int, default=1,
+                            help="Parse and create projects in this many processes at once, 0 uses one for each cpu")
+    cmd_parser.add_argument("--profile", "-pr", metavar="FILE",
+                            help="Time each phase of each project, write it to this json file and print a summary")
+    cmd_parser.add_argument("--watch", "-wa", nargs="?", type=positive_float, const=0.25, default=None,
+                            metavar="SECONDS",
+                            help="Keep running and update projects when their scripts change, "
+                                 "optionally set how often to check for changes (default 0.25)")
 
     cmd_parser.add_argument("--configs", "-c", nargs="+", default=(), help="Select configurations, added to configs set in base files")
     cmd_parser.add_argument("--platforms", "-p", nargs="+", default=(get_default_platform(),), choices=platforms,
@@ -69,6 +101,9 @@ def parse_args(generators: list) -> None:
     args.out_dir = os.path.normpath(args.out_dir) if os.path.isabs(args.out_dir) else \
         os.path.normpath(args.root_dir + os.sep + args.out_dir)
 
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+
     args.platforms = _convert_to_enum(args.platforms, Platform)
     args.archs = _convert_to_enum(args.archs, Arch)
 
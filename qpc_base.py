@@ -1,5 +1,7 @@
 import sys
 import os
+import glob
+import hashlib
 from platform import machine
 from enum import Enum, auto, EnumMeta
 from time import perf_counter
@@ -68,6 +70,16 @@ class BaseProjectGenerator:
     def projects_finished(self):
         pass
     
+    # with --jobs, create_project() is called in a worker process, so anything it keeps on the generator
+    # for projects_finished() or create_master_file() has to be sent back to the main process
+    # return what was kept since the last call and clear it, the main process passes it to merge_project_state()
+    def pop_project_state(self):
+        return None
+    
+    # called in the main process in the order projects are in, with the result of pop_project_state()
+    def merge_project_state(self, state) -> None:
+        pass
+    
     def _print_creating(self, output_name: str):
         if args.time:
             self._start_time = perf_counter()
@@ -221,6 +233,76 @@ def create_directory(directory: str):
             print("Created Directory: " + directory)
 
 
+# every glob done in a run, the same pattern is used by every pass of a project, the hash check and writing the hash
+# (absolute pattern, recursive): absolute paths found, files written while qpc is running aren't added to these
+GLOB_CACHE = {}
+# (absolute pattern, directory the paths are relative to): digest of the sorted paths, see PathContext.glob_digest()
+GLOB_DIGESTS = {}
+
+
+def glob_cached(pattern: str, recursive: bool = False) -> tuple:
+    key = (pattern, recursive)
+    if key not in GLOB_CACHE:
+        GLOB_CACHE[key] = tuple(glob.glob(pattern, recursive=recursive))
+    return GLOB_CACHE[key]
+
+
+# for anything that might change files, like --watch
+def clear_glob_cache():
+    GLOB_CACHE.clear()
+    GLOB_DIGESTS.clear()
+
+
+# relative paths are resolved against a directory with this, instead of changing the working directory to it,
+# so nothing depends on or changes the working directory, and projects can be parsed and created on threads
+# paths given to and returned by this stay relative, only the ones that touch the disk are made absolute
+class PathContext:
+    def __init__(self, directory: str):
+        self.dir = os.path.normpath(directory)
+
+    # the same as changing directory to sub_dir from this one
+    def join(self, sub_dir: str):
+        return PathContext(self.path(sub_dir)) if sub_dir else self
+
+    def path(self, path: str) -> str:
+        return path if os.path.isabs(path) else self.dir + os.sep + path
+
+    # the same as os.path.abspath() with the working directory at this one
+    def abspath(self, path: str) -> str:
+        return os.path.normpath(self.path(path))
+
+    def isfile(self, path: str) -> bool:
+        return os.path.isfile(self.path(path))
+
+    def isdir(self, path: str) -> bool:
+        return os.path.isdir(self.path(path))
+
+    def _glob_pattern(self, pattern: str) -> str:
+        return pattern if os.path.isabs(pattern) else glob.escape(self.dir + os.sep) + pattern
+
+    # returns the same paths glob.glob() would from this directory, each pattern is only globbed once, see GLOB_CACHE
+    def glob(self, pattern: str, recursive: bool = False) -> list:
+        found_files = glob_cached(self._glob_pattern(pattern), recursive)
+        if os.path.isabs(pattern):
+            return list(found_files)
+        start = len(self.dir) + 1
+        return [path[start:] for path in found_files]
+
+    # md5 of the paths found with glob(), sorted and joined with spaces, used for the glob_files in project hashes
+    def glob_digest(self, pattern: str) -> str:
+        key = (self._glob_pattern(pattern), self.dir)
+        if key not in GLOB_DIGESTS:
+            found_files = sorted([posix_path(path) for path in self.glob(pattern)])
+            GLOB_DIGESTS[key] = hashlib.md5(" ".join(found_files).encode()).hexdigest()
+        return GLOB_DIGESTS[key]
+
+    def create_directory(self, directory: str):
+        if not self.isdir(directory):
+            os.makedirs(self.path(directory))
+            if args.verbose:
+                print("Created Directory: " + directory)
+
+
 def get_all_dict_values(d: dict):
     found_values = []
     for k, v in d.items():
@@ -0,0 +1,127 @@
+# Stores parsed qpc scripts on disk, so scripts that haven't changed since the last run don't need to be read again
+# only used if --parsecache is set
+
+import os
+import pickle
+import hashlib
+from qpc_args import args
+from qpc_base import QPC_DIR
+
+
+QPC_CACHE_DIR = QPC_DIR + "cache/"
+CACHE_EXT = ".qpc_cache"
+
+# change this whenever the data stored in the cache changes, so old cache files are thrown out
+CACHE_VERSION = 1
+DEFAULT_CACHE_SIZE = 128  # MB
+
+
+def _file_digest(path: str) -> str:
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(128 * md5.block_size), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+class ParseCache:
+    def __init__(self):
+        self.enabled = False
+        self.max_size = DEFAULT_CACHE_SIZE * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+
+    def post_args_init(self):
+        if args.parse_cache:
+            self.enabled = True
+            self.max_size = args.parse_cache * 1024 * 1024
+            if not os.path.isdir(QPC_CACHE_DIR):
+                os.makedirs(QPC_CACHE_DIR)
+
+    @staticmethod
+    def _get_cache_path(path: str, options: tuple) -> tuple:
+        key = f"{os.path.abspath(path)}|{options}"
+        return key, QPC_CACHE_DIR + hashlib.md5(key.encode()).hexdigest() + CACHE_EXT
+
+    # returns the stored tree if the file hasn't changed, None otherwise
+    def load(self, path: str, options: tuple):
+        key, cache_path = self._get_cache_path(path, options)
+        try:
+            stat = os.stat(path)
+            with open(cache_path, "rb") as cache_file:
+                version, cache_key, size, mtime, digest, tree = pickle.load(cache_file)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+
+        if version != CACHE_VERSION or cache_key != key or size != stat.st_size:
+            self.misses += 1
+            return None
+
+        if mtime != stat.st_mtime_ns:
+            # only touched, not changed? check the contents before throwing it out
+            if digest != _file_digest(path):
+                self.misses += 1
+                return None
+            self._write(cache_path, key, stat, digest, tree)
+        else:
+            # most recently used, for deciding what to remove when the cache gets too big
+            os.utime(cache_path)
+
+        self.hits += 1
+        return tree
+
+    def store(self, path: str, options: tuple, stat: os.stat_result, tree: tuple) -> None:
+        key, cache_path = self._get_cache_path(path, options)
+        digest = _file_digest(path)
+
+        # modified while it was being read, the tree might not match what's on disk now
+        if os.stat(path).st_mtime_ns != stat.st_mtime_ns:
+            return
+
+        self._write(cache_path, key, stat, digest, tree)
+
+    @staticmethod
+    def _write(cache_path: str, key: str, stat: os.stat_result, digest: str, tree: tuple) -> None:
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "wb") as cache_file:
+                pickle.dump((CACHE_VERSION, key, stat.st_size, stat.st_mtime_ns, digest, tree),
+                            cache_file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, cache_path)
+        except OSError:
+            if os.path.isfile(temp_path):
+                os.remove(temp_path)
+
+    # remove the least recently used files until the cache is under the size limit
+    def finish(self) -> None:
+        if not self.enabled:
+            return
+
+        cache_files = []
+        total_size = 0
+        for entry in os.scandir(QPC_CACHE_DIR):
+            if entry.name.endswith(CACHE_EXT):
+                stat = entry.stat()
+                cache_files.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                total_size += stat.st_size
+
+        if total_size <= self.max_size:
+            return
+
+        cache_files.sort()
+        for mtime, size, cache_path in cache_files:
+            try:
+                os.remove(cache_path)
+            except OSError:
+                continue
+            total_size -= size
+            if total_size <= self.max_size:
+                break
+
+
+PARSE_CACHE = ParseCache()
+
+
+def post_args_init():
+    PARSE_CACHE.post_args_init()
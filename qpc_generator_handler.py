@@ -13,7 +13,7 @@ GENERATOR_PATH = QPC_GENERATOR_DIR + "/**"
 GENERATOR_LIST = []
 GENERATOR_PATHS = []
 
-for generator_folder in glob(GENERATOR_PATH):
+for generator_folder in sorted(glob(GENERATOR_PATH)):
     __generator = generator_folder + os.sep + os.path.split(generator_folder)[1] + ".py"
     if os.path.isfile(__generator):
         GENERATOR_LIST.append(os.path.basename(__generator)[:-3])
@@ -46,6 +46,8 @@ class GeneratorHandler:
         
         [self._import_generator(name) for name in GENERATOR_LIST]
         [self._init_generator(project_generator_type) for project_generator_type in inheritors(BaseProjectGenerator)]
+        # inheritors() is a set, sort them so they're always created in the same order, in every process with --jobs
+        self.project_generators_all.sort(key=lambda generator: (generator.id is None, generator.id or 0))
             
     def _import_generator(self, name: str):
         __import__(f"{GENERATOR_FOLDER}.{name}.{name}", locals(), globals())
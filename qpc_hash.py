@@ -1,31 +1,113 @@
 import hashlib
+import pickle
+import stat
 import qpc_reader
 from qpc_args import args
-from qpc_base import posix_path, QPC_DIR, QPC_GENERATOR_DIR
+from qpc_base import posix_path, PathContext, QPC_DIR, QPC_GENERATOR_DIR
 from qpc_reader import QPCBlockBase, QPCBlock
 from qpc_generator_handler import GENERATOR_PATHS, GENERATOR_LIST
 from qpc_logging import verbose
 import qpc_parser
 import qpc_project
-import glob
 import os
     
 
 QPC_HASH_DIR = QPC_DIR + "hashes/"
 
+STAT_CACHE_NAME = "files.qpc_stat_cache"
+# change this whenever the data stored in the stat cache changes, so an old one is thrown out
+STAT_CACHE_VERSION = 1
+
 
-# Source: https://bitbucket.org/prologic/tools/src/tip/md5sum
 def make_hash(filename: str) -> str:
+    return STAT_CACHE.make_hash(filename)
+
+
+# Source: https://bitbucket.org/prologic/tools/src/tip/md5sum
+def _read_hash(filename: str) -> str:
     md5 = hashlib.md5()
-    if os.path.isfile(filename):
-        with open(filename, "rb") as f:
-            for chunk in iter(lambda: f.read(128 * md5.block_size), b""):
-                md5.update(chunk)
-        return md5.hexdigest()
-    else:
-        return ""
-    
-    
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(128 * md5.block_size), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+# the hash of every file hashed before, with its size, modified time and inode at the time,
+# kept in the hashes folder between runs, so a file is only read again if one of those changed
+# unless --paranoid-hash is used, then every file is read every time
+class StatCache:
+    def __init__(self):
+        self.path = ""
+        # absolute path: (size, mtime_ns, inode, hash)
+        self.stats = {}
+        # files hashed in this process, see pop_new_stats()
+        self._new_stats = {}
+        # a file modified after this could have changed again without its modified time changing,
+        # since it's only so precise, so the ones from the last run that were modified after it was saved are read again
+        self._saved_time = 0
+    
+    def load(self) -> None:
+        self.path = QPC_HASH_DIR + STAT_CACHE_NAME
+        try:
+            saved_time = os.stat(self.path).st_mtime_ns
+            with open(self.path, "rb") as cache_file:
+                version, stats = pickle.load(cache_file)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            return
+        
+        if version == STAT_CACHE_VERSION:
+            self.stats = stats
+            self._saved_time = saved_time
+    
+    def make_hash(self, filename: str) -> str:
+        try:
+            file_stat = os.stat(filename)
+        except OSError:
+            return ""
+        if not stat.S_ISREG(file_stat.st_mode):
+            return ""
+        
+        path = os.path.abspath(filename)
+        key = (file_stat.st_size, file_stat.st_mtime_ns, file_stat.st_ino)
+        entry = self.stats.get(path)
+        if entry and entry[:3] == key and not args.paranoid_hash and \
+                (entry[1] < self._saved_time or path in self._new_stats):
+            return entry[3]
+        
+        file_hash = _read_hash(filename)
+        self.stats[path] = self._new_stats[path] = (*key, file_hash)
+        return file_hash
+    
+    # with --jobs, files hashed in the worker processes are sent back to the main process with these
+    def pop_new_stats(self) -> dict:
+        new_stats, self._new_stats = self._new_stats, {}
+        return new_stats
+    
+    def merge_stats(self, new_stats: dict) -> None:
+        self.stats.update(new_stats)
+        self._new_stats.update(new_stats)
+    
+    # files that don't exist anymore are removed
+    def save(self) -> None:
+        if not self._new_stats or not self.path:
+            return
+        
+        stats = {path: entry for path, entry in self.stats.items() if os.path.isfile(path)}
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "wb") as cache_file:
+                pickle.dump((STAT_CACHE_VERSION, stats), cache_file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.path)
+        except OSError:
+            if os.path.isfile(temp_path):
+                os.remove(temp_path)
+            return
+        self._new_stats = {}
+
+
+STAT_CACHE = StatCache()
+
+
 def hash_from_string(string: str):
     return hashlib.md5(string.encode()).hexdigest()
 
@@ -43,24 +125,33 @@ BASE_QPC_HASH_LIST = (
 )
         
         
+# filled in by post_args_init(), after the stat cache is loaded
 QPC_BASE_HASHES = {}
 QPC_GENERATOR_HASHES = {}
-
-for file in BASE_QPC_HASH_LIST:
-    QPC_BASE_HASHES[QPC_DIR + file] = make_hash(QPC_DIR + file)
-    
-for file in GENERATOR_LIST:
-    _generator = f"{QPC_GENERATOR_DIR}/{file}/{file}.py"
-    QPC_GENERATOR_HASHES[_generator] = make_hash(_generator)
-    
-QPC_HASHES = {**QPC_BASE_HASHES, **QPC_GENERATOR_HASHES}
+QPC_HASHES = {}
 
 CHECKED_HASHES = {}
 GENERATOR_FILE_NAMES = []
 ARCH_NAMES = []
 
 
+# paths in hash files are relative to the root directory
+def get_root_paths() -> PathContext:
+    return PathContext(args.root_dir)
+
+
 def post_args_init():
+    STAT_CACHE.load()
+    
+    for file in BASE_QPC_HASH_LIST:
+        QPC_BASE_HASHES[QPC_DIR + file] = make_hash(QPC_DIR + file)
+    
+    for file in GENERATOR_LIST:
+        generator = f"{QPC_GENERATOR_DIR}/{file}/{file}.py"
+        QPC_GENERATOR_HASHES[generator] = make_hash(generator)
+    
+    QPC_HASHES.update({**QPC_BASE_HASHES, **QPC_GENERATOR_HASHES})
+    
     GENERATOR_FILE_NAMES.extend([os.path.splitext(os.path.basename(__generator))[0] for __generator in args.generators])
     ARCH_NAMES.extend([arch.name.casefold() for arch in args.archs])
 
@@ -76,7 +167,7 @@ def get_rebuild_info(project_path: str, rebuild_generators: list) -> dict:
                 CHECKED_HASHES[project_path]["generators"].append(gen.filename)
             
     elif not CHECKED_HASHES[project_path]["generators"]:
-        CHECKED_HASHES[project_path]["generators"] = GENERATOR_FILE_NAMES
+        CHECKED_HASHES[project_path]["generators"] = list(GENERATOR_FILE_NAMES)
         
     return CHECKED_HASHES[project_path]
 
@@ -149,7 +240,7 @@ def _project_check_file_hash(project_dir: str, hash_list: list, project_path: st
         else:
             project_file_path = posix_path(os.path.normpath(project_dir + "/" + hash_block.values[0]))
         
-        if hash_block.key != make_hash(project_file_path):
+        if hash_block.key != make_hash(get_root_paths().path(project_file_path)):
             if not CHECKED_HASHES[project_path]["rebuild_all"] and hash_block.values[0] in QPC_GENERATOR_HASHES:
                 generator_name = os.path.splitext(os.path.basename(hash_block.values[0]))[0]
                 if generator_name in args.generators:
@@ -283,7 +374,7 @@ def _check_file_hash(project_dir: str, hash_list: list) -> bool:
         else:
             project_file_path = posix_path(os.path.normpath(project_dir + "/" + hash_block.values[0]))
         
-        if hash_block.key != make_hash(project_file_path):
+        if hash_block.key != make_hash(get_root_paths().path(project_file_path)):
             verbose("File Modified: " + hash_block.values[0])
             return False
     return True
@@ -340,13 +431,7 @@ def _check_glob_files(project_dir: str, file_list: list) -> bool:
         file_hash = file_block.key
         file_glob = file_block.values[0]
         
-        glob_list = glob.glob(project_dir + "/" + file_glob)
-        for index, path in enumerate(glob_list):
-            glob_list[index] = posix_path(path)
-            
-        glob_list.sort()
-
-        if file_hash != hash_from_string(' '.join(glob_list)):
+        if file_hash != get_root_paths().glob_digest(project_dir + "/" + file_glob):
             verbose("Files found are different: " + file_glob)
             return False
         
@@ -395,6 +480,48 @@ def get_project_dependencies(project_path: str, recurse: bool = False) -> list:
     return list(dep_list)
 
 
+# for projects only parsed for some generators, see ProjectContainer.add_previous_hash()
+def add_previous_hash(project_path: str, project: qpc_project.ProjectContainer) -> None:
+    project_hash_file_path = get_hash_file_path(project_path)
+    if not os.path.isfile(project_hash_file_path):
+        return
+    
+    hash_file = qpc_reader.read_file(project_hash_file_path)
+    if not hash_file:
+        return
+    
+    hashes_block = hash_file.get_item("hashes")
+    glob_files_block = hash_file.get_item("glob_files")
+    dependencies_block = hash_file.get_item("dependencies")
+    
+    hashes = {block.values[0]: block.key for block in hashes_block.items if block.values[0] not in QPC_HASHES} \
+        if hashes_block else {}
+    glob_files = [block.values[0] for block in glob_files_block.items] if glob_files_block else []
+    dependencies = [block.key for block in dependencies_block.items] if dependencies_block else []
+    project.add_previous_hash(hashes, glob_files, dependencies)
+
+
+# the scripts a project read and its glob_files patterns from its hash file, relative to the root directory
+def get_hashed_files(project_path: str) -> tuple:
+    project_hash_file_path = get_hash_file_path(project_path)
+    if not os.path.isfile(project_hash_file_path):
+        return [], []
+
+    hash_file = qpc_reader.read_file(project_hash_file_path)
+    if not hash_file:
+        return [], []
+
+    project_dir = os.path.split(project_path)[0]
+    hashes_block = hash_file.get_item("hashes")
+    glob_files_block = hash_file.get_item("glob_files")
+
+    scripts = [os.path.normpath(os.path.join(project_dir, block.values[0])) for block in hashes_block.items
+               if block.values[0] not in QPC_HASHES] if hashes_block else []
+    glob_files = [os.path.join(project_dir, block.values[0]) for block in glob_files_block.items] \
+        if glob_files_block else []
+    return scripts, glob_files
+
+
 def write_project_hash(project_path: str, project: qpc_project.ProjectContainer, generators: list) -> None:
     base_block = QPCBlockBase(project_path)
     
@@ -413,18 +540,14 @@ def write_project_hash(project_path: str, project: qpc_project.ProjectContainer,
         
     glob_files_block = base_block.add_item("glob_files", [])
     for path in project.get_glob_files():
-        found_files = glob.glob(os.path.split(project_path)[0] + "/" + path)
-        for index, _path in enumerate(found_files):
-            found_files[index] = posix_path(_path)
-        found_files.sort()
-        glob_files_block.add_item(hash_from_string(' '.join(found_files)), path)
+        glob_files_block.add_item(get_root_paths().glob_digest(os.path.split(project_path)[0] + "/" + path), path)
 
     if project.dependencies:
         dependencies_block = base_block.add_item("dependencies", [])
         [dependencies_block.add_item(script_path, None) for script_path in project.dependencies]
 
     with open(get_hash_file_path(project_path), mode="w", encoding="utf-8") as hash_file:
-        hash_file.write(base_block.to_string(True, True))
+        base_block.write_to(hash_file, True, True)
 
 
 def write_master_file_hash(project_path: str, base_info, platforms: list, generator_path: str, out_dir: str = ""):
@@ -464,12 +587,12 @@ def write_master_file_hash(project_path: str, base_info, platforms: list, genera
                 script.add_item("dependency_hash", value)
 
     with open(get_hash_file_path(project_path), mode="w", encoding="utf-8") as hash_file:
-        hash_file.write(base_block.to_string(True, True))
+        base_block.write_to(hash_file, True, True)
         
         
 def _write_hash_commands(base_block: QPCBlockBase, out_dir: str = "", master_file: bool = False) -> None:
     commands = base_block.add_item("commands", [])
-    commands.add_item("working_dir", os.getcwd().replace('\\', '/') + "/" + os.path.split(base_block.file_path)[0])
+    commands.add_item("working_dir", args.root_dir.replace('\\', '/') + "/" + os.path.split(base_block.file_path)[0])
     commands.add_item("out_dir", out_dir.replace('\\', '/'))
     commands.add_item("macros", args.macros)
     commands.add_item("architectures", ARCH_NAMES)
@@ -1,8 +1,10 @@
 import os
 import sys
 import platform
+import threading
 from qpc_args import args
 from enum import Enum
+from contextlib import contextmanager
 
 
 _win32_legacy_con = False
@@ -51,18 +53,45 @@ class Severity(Enum):
     
 WARNING_COUNT = 0
 
+# warnings made on a thread while in capture_warnings() are kept in a list instead of printed
+_captured = threading.local()
+
 
 def warning(*text):
     warning_no_line(*text[:-1], text[-1] + "\n")
 
 
 def warning_no_line(*text):
+    captured = getattr(_captured, "warnings", None)
+    if captured is not None:
+        captured.append(text)
+        return
     if not args.hide_warnings:
         _print_severity(Severity.WARNING, "\n          ", *text)
     global WARNING_COUNT
     WARNING_COUNT += 1
 
 
+# for reading files on other threads, the warnings are printed with print_warnings() if the file is used
+@contextmanager
+def capture_warnings():
+    previous = getattr(_captured, "warnings", None)
+    _captured.warnings = []
+    try:
+        yield _captured.warnings
+    finally:
+        _captured.warnings = previous
+
+
+def print_warnings(warnings: list):
+    [warning_no_line(*text) for text in warnings]
+
+
+# includes warnings captured on this thread
+def get_warning_count() -> int:
+    return WARNING_COUNT + len(getattr(_captured, "warnings", None) or ())
+
+
 def error(*text):
     _print_severity(Severity.ERROR, "\n        ", *text, "\n")
     quit(1)
@@ -1,14 +1,19 @@
 import os
-import glob
 import qpc_hash
 from qpc_reader import read_file, QPCBlock, QPCBlockBase
 from qpc_args import args, get_arg_macros
-from qpc_base import Platform, Arch, check_file_path_glob
+from qpc_base import Platform, Arch, PathContext, check_file_path_glob
 from qpc_project import ProjectContainer, ProjectPass, ProjectDefinition, ProjectGroup, BuildEvent, ConfigType, \
-                        replace_macros, replace_macros_list
-from qpc_logging import warning, error, verbose, verbose_color, print_color, Color
+                        Macros, MacroScope, replace_macros, replace_macros_list
+from qpc_logging import warning, error, verbose, verbose_color, print_color, Color, capture_warnings, print_warnings
 from enum import Enum
 from time import perf_counter
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+
+
+# threads used for reading included scripts ahead of the parser, mostly spent waiting on the disk
+PREFETCH_THREADS = 8
 
 
 # unused, idk if this will ever be useful either
@@ -58,12 +63,18 @@ class BaseInfoPlatform:
     def __init__(self, base_info, platform: Enum):
         self.shared = base_info
         self.platform = platform
-        self.macros = {**get_arg_macros(), **get_platform_macros(platform)}
+        self.macros = MacroScope(get_platform_macros(platform), base_info.macros)
         
         verbose("")
         [verbose_color(Color.DGREEN, 'Set Macro: {0} = "{1}"'.format(name, value)) for name, value in self.macros.items()]
         
         self._projects_all = []
+        # indexes of _projects_all, the first project added is kept for each key, like a search through the list finds
+        # paths can change after a project is added, so these are checked against the project when used, see _find_project()
+        self._projects_all_index = {}  # position of each project in _projects_all
+        self._projects_by_name = {}
+        self._projects_by_path = {}
+        self._projects_by_path_real = {}
         
         # this stores all everything in dependency_paths in a base file
         # and also has path fixes on it if used with a include with a path to change to
@@ -75,10 +86,12 @@ class BaseInfoPlatform:
         self.configurations = []
         self.projects = []
         self.project_folders = {}
+        self._project_names = set()  # names of everything in self.projects
         
         self.project_dependencies = {}
         
-    def add_project(self, project_name: str, project_path: str, include_dir: str = "") -> None:
+    # paths is the directory project_path is relative to, see PathContext
+    def add_project(self, project_name: str, project_path: str, paths: PathContext, include_dir: str = "") -> None:
         # TODO: check if script path is already used
         project_def = self.shared.add_project(project_name)
         project_def.platforms.add(self.platform)
@@ -91,39 +104,62 @@ class BaseInfoPlatform:
         if not project_path:
             return
         
-        if os.path.isfile(project_path):
+        if paths.isfile(project_path):
             project_def.path_real = project_path
             project_def.path = include_dir + project_path
         else:
             warning("Script does not exist: " + project_path)
 
+        self._add_project_def(project_def)
+        
+        # project definitions are shared by every platform, so the other platforms with it need the new paths too
+        for info_plat in self.shared.info_list:
+            if info_plat is not self and project_def in info_plat._projects_all_index:
+                info_plat._index_project_paths(project_def)
+    
+    def _add_project_def(self, project_def: ProjectDefinition) -> None:
+        self._projects_all_index.setdefault(project_def, len(self._projects_all))
         self._projects_all.append(project_def)
+        self._projects_by_name.setdefault(project_def.name, project_def)
+        self._index_project_paths(project_def)
+        
+    def _index_project_paths(self, project_def: ProjectDefinition) -> None:
+        self._index_project(self._projects_by_path, "path", project_def)
+        self._index_project(self._projects_by_path_real, "path_real", project_def)
+        
+    def _index_project(self, index: dict, attr: str, project_def: ProjectDefinition) -> None:
+        key = getattr(project_def, attr)
+        indexed = index.get(key)
+        if indexed is None or getattr(indexed, attr) != key or \
+                self._projects_all_index[project_def] < self._projects_all_index[indexed]:
+            index[key] = project_def
         
-    def add_project_to_group(self, project_name: str, project_group: ProjectGroup, folder_list: list):
+    def add_project_to_group(self, project_name: str, project_group: ProjectGroup, folder_list: list,
+                             paths: PathContext):
         project_def = self.get_project(project_name)
-        if not project_def and self.add_project_by_script(project_name):
+        if not project_def and self.add_project_by_script(project_name, paths):
             project_def = self.get_project(project_name)
                 
         if project_def:
             project_group.add_project(project_def.name, folder_list)
         else:
             project_def = ProjectDefinition(self.shared, project_name)
-            self._projects_all.append(project_def)
+            self._add_project_def(project_def)
         
-    def add_project_by_script(self, project_path: str) -> bool:
+    def add_project_by_script(self, project_path: str, paths: PathContext) -> bool:
         if check_file_path_glob(project_path):
-            for found_file in glob.glob(project_path):
-                self.add_project(os.path.splitext(os.path.basename(found_file))[0], found_file)
+            for found_file in paths.glob(project_path):
+                self.add_project(os.path.splitext(os.path.basename(found_file))[0], found_file, paths)
             return True
-        elif os.path.isfile(project_path):
-            self.add_project(os.path.splitext(os.path.basename(project_path))[0], project_path)
+        elif paths.isfile(project_path):
+            self.add_project(os.path.splitext(os.path.basename(project_path))[0], project_path, paths)
             return True
         # elif not self.is_project_added(project_path) and project_path not in self.shared.groups:
         return False
         
     def init_args(self):
         for project_path in args.add:
-            if not self.add_project_by_script(project_path):
+            if not self.add_project_by_script(project_path, self.shared.paths):
                 if project_path not in self.shared.groups and not self.is_project_added(project_path):
                     warning("Project, Group, or File does not exist: " + project_path)
 
@@ -145,20 +181,33 @@ class BaseInfoPlatform:
     def is_project_added(self, project_name: str) -> bool:
         return bool(self.get_project_by_script(project_name))
 
-    def get_project_by_script(self, project_path: str) -> ProjectDefinition:
+    # attr is the ProjectDefinition attribute the index is for
+    def _find_project(self, index: dict, attr: str, key: str) -> ProjectDefinition:
+        project = index.get(key)
+        if project is None or getattr(project, attr) == key:
+            return project
+        # the path changed since it was indexed, fall back to searching for the current first one with it
         for project in self._projects_all:
-            if project_path == project.path:
+            if getattr(project, attr) == key:
                 return project
 
+    def get_project_by_script(self, project_path: str) -> ProjectDefinition:
+        return self._find_project(self._projects_by_path, "path", project_path)
+
     def get_project_by_name(self, project_name: str) -> ProjectDefinition:
-        for project in self._projects_all:
-            if project.name == project_name:
-                return project
+        return self._projects_by_name.get(project_name)
+
+    # returns whichever project was added first
+    def _first_project(self, *projects) -> ProjectDefinition:
+        projects = [project for project in projects if project]
+        return min(projects, key=self._projects_all_index.get) if projects else None
+
+    def get_project_by_path(self, project_path: str) -> ProjectDefinition:
+        return self._first_project(self.get_project_by_script(project_path),
+                                   self._find_project(self._projects_by_path_real, "path_real", project_path))
 
     def get_project(self, project_name: str) -> ProjectDefinition:
-        for project in self._projects_all:
-            if project_name in {project.name, project.path, project.path_real}:
-                return project
+        return self._first_project(self.get_project_by_name(project_name), self.get_project_by_path(project_name))
         
     def get_dependency_path(self, key: str):
         project = self.get_project(key)
@@ -168,10 +217,8 @@ class BaseInfoPlatform:
 
     def _use_project(self, project: ProjectDefinition, unwanted_projects: dict, folders: tuple = None):
         if self.platform in project.platforms and project.name not in unwanted_projects:
-            for added_project in self.projects:
-                if added_project.name == project.name:
-                    break
-            else:
+            if project.name not in self._project_names:
+                self._project_names.add(project.name)
                 self.projects.append(project)
                 self.project_folders[project.name] = folders if folders else ()
         
@@ -179,6 +226,7 @@ class BaseInfoPlatform:
     def setup_wanted_projects(self, add_list: list, remove_list: list, unwanted_projects: dict) -> None:
         self.projects = []
         self.project_folders = {}
+        self._project_names = set()
 
         for removed_item in remove_list:
             if removed_item in self.shared.groups:
@@ -187,13 +235,12 @@ class BaseInfoPlatform:
                         unwanted_projects[project] = None
             
             elif removed_item in self.shared.projects_all:
-                if self.shared.projects_all[removed_item] in self._projects_all:
+                if self.shared.projects_all[removed_item] in self._projects_all_index:
                     unwanted_projects[removed_item] = None
             else:
-                for project in self._projects_all:
-                    if removed_item == project.path:
-                        unwanted_projects[project.name] = None
-                        break
+                project = self.get_project_by_script(removed_item)
+                if project:
+                    unwanted_projects[project.name] = None
                 else:
                     warning("Project, Group, or Script does not exist: " + removed_item)
         
@@ -205,13 +252,12 @@ class BaseInfoPlatform:
                         self._use_project(self.get_project(project), unwanted_projects, folders)
                         
                 elif added_item in self.shared.projects_all:
-                    if self.shared.projects_all[added_item] in self._projects_all:
+                    if self.shared.projects_all[added_item] in self._projects_all_index:
                         self._use_project(self.shared.projects_all[added_item], unwanted_projects)
                 else:
-                    for project in self._projects_all:
-                        if added_item in {project.path, project.path_real}:
-                            self._use_project(project, unwanted_projects)
-                            break
+                    project = self.get_project_by_path(added_item)
+                    if project:
+                        self._use_project(project, unwanted_projects)
                     else:
                         warning("Project, Group, or Script does not exist: " + added_item)
         else:
@@ -219,11 +265,15 @@ class BaseInfoPlatform:
 
 
 class BaseInfo:
-    def __init__(self):
+    # paths is the root directory, everything in the base files and the command line is relative to it
+    def __init__(self, paths: PathContext):
+        self.paths = paths
         self.projects_all = {}
         self.projects = {}  # maybe remove?
         self.groups = {}
         self.active_group = None
+        # macros from the command line, under the macros of every platform and project
+        self.macros = Macros(get_arg_macros())
         # maybe add something for archs?
         self.info_list = [BaseInfoPlatform(self, platform) for platform in args.platforms]
         
@@ -235,10 +285,35 @@ class BaseInfo:
         self._prepare_groups()
         self._prepare_projects()
         
+    # finishes every group once, after all the groups it contains, in one depth first walk over them
+    # a group that ends up containing itself is warned about, and that contains is ignored
     def _prepare_groups(self):
-        for group_name, group in self.groups.items():
-            group.finished()
-        pass
+        finished_groups = set()
+        skip_groups = {}
+        
+        for root_group in self.groups.values():
+            if root_group in finished_groups:
+                continue
+            
+            # dict of the groups being walked through, in order, for printing the chain of a recursive group
+            group_chain = {root_group: None}
+            stack = [(root_group, iter(root_group.get_contained_groups()))]
+            while stack:
+                group, contained_groups = stack[-1]
+                for contained_group in contained_groups:
+                    if contained_group in group_chain:
+                        chain = [*list(group_chain)[list(group_chain).index(contained_group):], contained_group]
+                        warning("Group contains itself, ignoring: " + " -> ".join([item.name for item in chain]))
+                        skip_groups.setdefault(group, set()).add(contained_group)
+                    elif contained_group not in finished_groups:
+                        group_chain[contained_group] = None
+                        stack.append((contained_group, iter(contained_group.get_contained_groups())))
+                        break
+                else:
+                    stack.pop()
+                    del group_chain[group]
+                    group.finished(skip_groups.get(group))
+                    finished_groups.add(group)
 
     def _prepare_projects(self) -> dict:
         self.projects = {}  # dict keeps order, set doesn't as of 3.8, both faster than lists
@@ -249,7 +324,7 @@ class BaseInfo:
         
         def add_item(item_list: list, _item: str):
             if check_file_path_glob(_item):
-                item_list.extend(glob.glob(_item))
+                item_list.extend(self.paths.glob(_item))
             else:
                 item_list.append(_item)
 
@@ -279,6 +354,16 @@ class BaseInfo:
     def add_project(self, project_name: str) -> ProjectDefinition:
         return self._add_group_project(project_name, self.projects_all, ProjectDefinition)
 
+    # masks have bit N set for self.info_list[N], used for parsing base files for every platform at once
+    def get_all_info_mask(self) -> int:
+        return (1 << len(self.info_list)) - 1
+
+    def get_info_mask(self, mask: int) -> list:
+        return [info_plat for index, info_plat in enumerate(self.info_list) if mask >> index & 1]
+
+    def get_info_macros(self) -> list:
+        return [info_plat.macros for info_plat in self.info_list]
+
     def get_base_info(self, platform: Platform) -> BaseInfoPlatform:
         if platform in Platform:
             for base_info in self.info_list:
@@ -337,42 +422,57 @@ class BaseInfo:
 
 
 class Parser:
-    def __init__(self):
+    # paths is the root directory, defaults to the one from the command line
+    def __init__(self, paths: PathContext = None):
+        self.paths = paths if paths else PathContext(args.root_dir)
         self.counter = 0
         self.read_files = {}
+        # absolute path: future of a script being read ahead of time and its warnings, see prefetch_includes()
+        self.prefetched = {}
+        self._prefetch_pool = None
+        self._prefetch_lock = Lock()
 
     # TODO: bug discovered with this,
     #  if i include the groups before the base_info, it won't add any base_info
     # def parse_base_settings(self, base_file_path: str, output_type: str, platform: Enum) -> BaseInfo:
     def parse_base_info(self, base_file_path: str) -> BaseInfo:
-        info = BaseInfo()
+        info = BaseInfo(self.paths)
 
         if base_file_path:
             verbose("\nReading: " + args.base_file)
 
-            base_file = self.read_file(base_file_path)
+            base_file = self.read_file(base_file_path, self.paths)
             if not base_file:
                 warning("Base File does not exist: " + base_file_path)
             else:
+                self.prefetch_includes(base_file, info.info_list[0].macros, self.paths, True)
                 verbose("\nParsing: " + args.base_file)
                 
-                [self._parse_base_info_recurse(info_plat, base_file) for info_plat in info.info_list]
+                # every platform is parsed in one walk over the base files, blocks are skipped if no platform uses them
+                self._parse_base_info_recurse(info, base_file, info.get_all_info_mask(), self.paths)
 
         info.finish_parsing()
         return info
     
-    def _parse_base_info_recurse(self, info: BaseInfoPlatform, base_file: QPCBlockBase, include_dir: str = "") -> None:
-        for project_block in base_file:
+    # mask is the platforms this is parsed for, see BaseInfo.get_info_mask()
+    # paths is the directory the paths in base_file are relative to
+    def _parse_base_info_recurse(self, info: BaseInfo, base_file: QPCBlockBase, mask: int, paths: PathContext,
+                                 include_dir: str = "") -> None:
+        macros_list = info.get_info_macros()
         
-            if not project_block.solve_condition(info.macros):
+        for project_block in base_file:
+            block_mask = project_block.solve_condition_mask(macros_list, mask)
+            
+            if not block_mask:
                 continue
         
             elif project_block.key == "macro":
-                info.add_macro(project_block)
+                [info_plat.add_macro(project_block) for info_plat in info.get_info_mask(block_mask)]
         
             elif project_block.key == "configurations":
-                configs = project_block.get_item_list_condition(info.macros)
-                [info.configurations.append(config) for config in configs if config not in info.configurations]
+                for info_plat in info.get_info_mask(block_mask):
+                    configs = project_block.get_item_list_condition(info_plat.macros)
+                    [info_plat.configurations.append(config) for config in configs if config not in info_plat.configurations]
         
             # obsolete
             elif project_block.key == "dependency_paths":
@@ -383,57 +483,65 @@ class Parser:
                 continue
 
             elif project_block.key == "project":
-                self._base_project_define(project_block, info, include_dir)
+                self._base_project_define(project_block, info, block_mask, paths, include_dir)
 
             elif project_block.key == "group":
-                self._base_group_define(project_block, info)
+                self._base_group_define(project_block, info, block_mask, paths)
 
             elif project_block.key == "include":
                 # "Ah shit, here we go again."
-                file_path = os.path.normpath(replace_macros(project_block.values[0], info.macros))
-                new_include_dir = include_dir
-                
-                if len(project_block.values) >= 2:
-                    new_include_dir += "/" + project_block.values[1] if include_dir else project_block.values[1]
-                    new_include_dir = replace_macros(new_include_dir, info.macros)
-                    current_dir = os.getcwd()
-                    if os.path.isdir(new_include_dir):
-                        os.chdir(new_include_dir)
-                
-                verbose("Reading: " + file_path)
-            
-                try:
-                    include_file = read_file(file_path)
-            
-                    verbose("Parsing... ")
+                # macros can be different on each platform, so group the platforms by the file they include
+                include_masks = {}
+                for index, info_plat in enumerate(info.info_list):
+                    if block_mask >> index & 1:
+                        file_path = os.path.normpath(replace_macros(project_block.values[0], info_plat.macros))
+                        new_include_dir = include_dir
+                        if len(project_block.values) >= 2:
+                            new_include_dir += "/" + project_block.values[1] if include_dir else project_block.values[1]
+                            new_include_dir = replace_macros(new_include_dir, info_plat.macros)
+                        include_key = (file_path, new_include_dir)
+                        include_masks[include_key] = include_masks.get(include_key, 0) | 1 << index
                 
-                    self._parse_base_info_recurse(info, include_file, new_include_dir)
-                except FileNotFoundError:
-                    project_block.warning("File Does Not Exist: ")
-                    
-                if len(project_block.values) >= 2:
-                    os.chdir(current_dir)
+                for (file_path, new_include_dir), include_mask in include_masks.items():
+                    self._base_include(project_block, info, include_mask, paths, file_path, new_include_dir)
 
             elif not args.hide_warnings:
                 project_block.warning("Unknown Key: ")
+    
+    def _base_include(self, project_block: QPCBlock, info: BaseInfo, mask: int, paths: PathContext, file_path: str,
+                      include_dir: str):
+        # the included file and everything in it is relative to the include directory, if it exists
+        if len(project_block.values) >= 2 and paths.isdir(include_dir):
+            paths = paths.join(include_dir)
+        
+        verbose("Reading: " + file_path)
+    
+        try:
+            include_file = self._read_file(file_path, paths)
+    
+            verbose("Parsing... ")
+        
+            self._parse_base_info_recurse(info, include_file, mask, paths, include_dir)
+        except FileNotFoundError:
+            project_block.warning("File Does Not Exist: ")
             
-    def _base_group_define(self, group_block: QPCBlock, info: BaseInfoPlatform):
+    def _base_group_define(self, group_block: QPCBlock, info: BaseInfo, mask: int, paths: PathContext):
         if not group_block.values:
             group_block.warning("No Group Name Defined, skipping")
             return
         
         group = group_block.values[0]
-        project_group = info.shared.add_group(group)
-        self._parse_project_group_items(project_group, info, group_block, [])
+        project_group = info.add_group(group)
+        self._parse_project_group_items(project_group, info, mask, paths, group_block, [])
         
         for contain_group_name in group_block.values[1:]:
-            contain_group = info.shared.add_group(contain_group_name)
+            contain_group = info.add_group(contain_group_name)
             contain_group.contains_group(project_group, [])
             
     @staticmethod
-    def _base_project_define(block: QPCBlock, info: BaseInfoPlatform, include_dir: str = ""):
+    def _base_project_define(block: QPCBlock, info: BaseInfo, mask: int, paths: PathContext, include_dir: str = ""):
         script = block.values[1] if len(block.values) >= 2 else ""
-        info.add_project(block.values[0], script, include_dir)
+        [info_plat.add_project(block.values[0], script, paths, include_dir) for info_plat in info.get_info_mask(mask)]
 
     @staticmethod
     def _check_plat_condition(condition: str) -> bool:
@@ -441,25 +549,30 @@ class Parser:
         if "windows" in cond or "linux" in cond or "macos" in cond or "posix" in cond:
             return True
     
-    def _parse_project_group_items(self, project_group: ProjectGroup, info: BaseInfoPlatform,
+    def _parse_project_group_items(self, project_group: ProjectGroup, info: BaseInfo, mask: int, paths: PathContext,
                                    project_block: QPCBlock, folder_list: list) -> None:
-        for item in project_block.get_items_cond(info.macros):
+        macros_list = info.get_info_macros()
+        for item in project_block.items:
+            item_mask = item.solve_condition_mask(macros_list, mask)
+            if not item_mask:
+                continue
+            
             if item.key == "folder":
                 folder_list.append(item.values[0])
-                self._parse_project_group_items(project_group, info, item, folder_list)
+                self._parse_project_group_items(project_group, info, item_mask, paths, item, folder_list)
                 folder_list.remove(item.values[0])
                 
             elif item.key == "contains":
                 for group_name in item.values:
-                    if group_name in info.shared.groups:
-                        contain_group = info.shared.groups[group_name]
+                    if group_name in info.groups:
+                        contain_group = info.groups[group_name]
                     else:
-                        contain_group = info.shared.add_group(group_name)
+                        contain_group = info.add_group(group_name)
                     project_group.contains_group(contain_group, folder_list)
                         
             else:
-                info.add_project_to_group(item.key, project_group, folder_list)
-                # project_group.add_project(item.key, folder_list, info.shared.unsorted_projects)
+                for info_plat in info.get_info_mask(item_mask):
+                    info_plat.add_project_to_group(item.key, project_group, folder_list, paths)
     
     def parse_project(self, project_def: ProjectDefinition, project_script: str, info: BaseInfo, generator_list: list) -> ProjectContainer:
         if args.time:
@@ -467,27 +580,34 @@ class Parser:
         elif not args.verbose:
             print("Parsing: " + project_script)
 
-        project_filename = os.path.split(project_script)[1]
-        project_block = self.read_file(project_filename)
+        project_dir, project_filename = os.path.split(project_script)
+        paths = info.paths.join(project_dir)
+        project_block = self.read_file(project_filename, paths)
 
         if project_block is None:
             warning("Script does not exist: " + project_script)
             return
 
         project_name = os.path.splitext(project_filename)[0]
-        project_container = ProjectContainer(project_name, project_script, info, project_def, generator_list)
+        project_container = ProjectContainer(project_name, project_script, info, project_def, generator_list, paths)
         
+        if project_container._passes:
+            self.prefetch_includes(project_block, project_container._passes[0].macros, paths)
+        
+        project_hash = qpc_hash.make_hash(paths.path(project_filename))
         for project_pass in project_container._passes:
             verbose(f"\n ---- Parsing Project - "
                     f"Config: \"{project_pass.config_name}\" "
                     f"Platform: \"{project_pass.platform.name}\" "
                     f"Arch: \"{project_pass.arch.name}\" ---- \n")
+            project_pass.hash_list[project_filename] = project_hash
 
-            verbose("Parsing: " + project_script)
-            project_pass.hash_list[project_filename] = qpc_hash.make_hash(project_filename)
-            self._parse_project(project_block, project_pass, project_script)
-            self.counter += 1
-            
+        # every pass is parsed in one walk over the script, blocks are skipped if no pass uses them
+        verbose("Parsing: " + project_script)
+        self._parse_project(project_block, project_container, project_container.get_all_passes_mask(), project_script)
+        self.counter += len(project_container._passes)
+        
+        for project_pass in project_container._passes:
             if project_pass.config.general.configuration_type is None:
                 error("No configuration_type Specified in Script!",
                       "Pick one of these and add it to the \"general\" group:",
@@ -500,58 +620,76 @@ class Parser:
             
         return project_container
     
-    def _parse_project(self, project_file: QPCBlockBase, project: ProjectPass, file_path: str, indent: str = "") -> None:
+    # mask is the passes of the project this is parsed for, see ProjectContainer.get_passes_mask()
+    def _parse_project(self, project_file: QPCBlockBase, project: ProjectContainer, mask: int, file_path: str,
+                       indent: str = "") -> None:
         file_dir, file_name = os.path.split(file_path)
+        macros_list = project.get_passes_macros()
         
-        def set_script_macros():
-            project.add_macro(indent, "SCRIPT_NAME", file_name)
-            project.add_macro(indent, "SCRIPT_DIR", file_dir)
+        def set_script_macros(script_mask: int):
+            for project_pass in project.get_passes_mask(script_mask):
+                project_pass.add_macro(indent, "SCRIPT_NAME", file_name)
+                project_pass.add_macro(indent, "SCRIPT_DIR", file_dir)
 
-        set_script_macros()
+        set_script_macros(mask)
         
         for project_block in project_file:
-            if project_block.solve_condition(project.macros):
-            
-                if project_block.key == "macro":
-                    project.add_macro(indent, *project.replace_macros_list(*project_block.values))
-            
-                elif project_block.key == "configuration":
-                    self._parse_config(project_block, project)
-            
-                elif project_block.key == "files":
-                    self._parse_files(project_block, project, [])
+            block_mask = project_block.solve_condition_mask(macros_list, mask)
+            if not block_mask:
+                continue
             
-                elif project_block.key == "dependencies":
-                    for block in project_block.get_items_cond(project.macros):
+            if project_block.key == "macro":
+                for project_pass in project.get_passes_mask(block_mask):
+                    project_pass.add_macro(indent, *project_pass.replace_macros_list(*project_block.values))
+        
+            elif project_block.key == "configuration":
+                self._parse_config(project_block, project, block_mask)
+        
+            elif project_block.key == "files":
+                self._parse_files(project_block, project, block_mask, [])
+        
+            elif project_block.key == "dependencies":
+                for block in project_block.items:
+                    for project_pass in project.get_passes_mask(block.solve_condition_mask(macros_list, block_mask)):
                         if block.key == "-":
-                            project.remove_dependencies(*block.values)
+                            project_pass.remove_dependencies(*block.values)
                         else:
-                            project.add_dependencies(block.key, *block.values)
-            
-                elif project_block.key == "build_event":
-                    self._parse_build_event(project_block, project)
-                    
-                elif project_block.key == "include":
-                    # Ah shit, here we go again.
-                    include_path = project.replace_macros(project_block.values[0])
-                    include_file = self._include_file(include_path, project, indent + "    ")
+                            project_pass.add_dependencies(block.key, *block.values)
+        
+            elif project_block.key == "build_event":
+                for project_pass in project.get_passes_mask(block_mask):
+                    self._parse_build_event(project_block, project_pass)
+                
+            elif project_block.key == "include":
+                # Ah shit, here we go again.
+                # macros can be different in each pass, so group the passes by the file they include
+                include_masks = {}
+                for index, project_pass in enumerate(project._passes):
+                    if block_mask >> index & 1:
+                        include_path = project_pass.replace_macros(project_block.values[0])
+                        include_masks[include_path] = include_masks.get(include_path, 0) | 1 << index
+                
+                for include_path, include_mask in include_masks.items():
+                    include_file = self._include_file(include_path, project, include_mask, indent + "    ")
                     if include_file:
                         try:
-                            self._parse_project(include_file, project, include_path, indent + "    ")
+                            self._parse_project(include_file, project, include_mask, include_path, indent + "    ")
                             # reset the script macros back to the values for this script
-                            set_script_macros()
+                            set_script_macros(include_mask)
                         except RecursionError:
                             raise RecursionError("Recursive Includes found:\n" + project_block.get_formatted_info())
                         verbose(indent + "    " + "Finished Parsing")
                     else:
                         project_block.warning(f"File does not exist: {include_path}")
-                    
-                else:
-                    project_block.warning("Unknown key: ")
+                
+            else:
+                project_block.warning("Unknown key: ")
     
-    def _include_file(self, include_path: str, project: ProjectPass, indent: str) -> QPCBlockBase:
-        project.hash_list[include_path] = qpc_hash.make_hash(include_path)
-        include_file = self.read_file(include_path)
+    def _include_file(self, include_path: str, project: ProjectContainer, mask: int, indent: str) -> QPCBlockBase:
+        include_hash = qpc_hash.make_hash(project.paths.path(include_path))
+        for project_pass in project.get_passes_mask(mask):
+            project_pass.hash_list[include_path] = include_hash
+        include_file = self.read_file(include_path, project.paths)
     
         if not include_file:
             return None
@@ -579,31 +717,36 @@ class Parser:
                     
             project.build_events[project_block.values[0]] = build_event
     
-    def _parse_files(self, files_block: QPCBlock, project: ProjectPass, folder_list: list) -> None:
-        if files_block.solve_condition(project.macros):
-            for block in files_block.items:
-                if not block.solve_condition(project.macros):
-                    continue
-                
-                if block.key == "folder":
-                    folder_list.append(block.values[0])
-                    self._parse_files(block, project, folder_list)
-                    folder_list.remove(block.values[0])
-                elif block.key == "-":
-                    project.remove_file(folder_list, block)
-                else:
-                    project.add_file(folder_list, block)
+    def _parse_files(self, files_block: QPCBlock, project: ProjectContainer, mask: int, folder_list: list) -> None:
+        macros_list = project.get_passes_macros()
+        mask = files_block.solve_condition_mask(macros_list, mask)
+        if not mask:
+            return
+        
+        for block in files_block.items:
+            block_mask = block.solve_condition_mask(macros_list, mask)
+            if not block_mask:
+                continue
+            
+            if block.key == "folder":
+                folder_list.append(block.values[0])
+                self._parse_files(block, project, block_mask, folder_list)
+                folder_list.remove(block.values[0])
+            elif block.key == "-":
+                for project_pass in project.get_passes_mask(block_mask):
+                    project_pass.remove_file(folder_list, block)
+            else:
+                for project_pass in project.get_passes_mask(block_mask):
+                    project_pass.add_file(folder_list, block)
                 
                     if block.items:
                         for file_path in block.get_list():
-                            if check_file_path_glob(file_path):
-                                [self._source_file(block, project, found_file) for found_file in glob.glob(file_path)]
-                            else:
-                                self._source_file(block, project, file_path)
+                            for found_file, is_source_file in project.get_file_paths(file_path):
+                                self._source_file(block, project_pass, found_file)
                        
     @staticmethod
     def _source_file(files_block: QPCBlock, project: ProjectPass, file_path: str):
-        source_file = project.get_source_file(file_path)
+        source_file = project.edit_source_file(file_path)
         if not source_file:
             return
     
@@ -624,21 +767,85 @@ class Parser:
                     # new, cleaner way, just assume it's compiler
                     source_file.compiler.parse_option(project.macros, config_block)
 
-    def read_file(self, script_path: str) -> QPCBlockBase:
-        if script_path in self.read_files:
-            return self.read_files[script_path]
+    # paths is the directory script_path is relative to
+    def read_file(self, script_path: str, paths: PathContext) -> QPCBlockBase:
+        try:
+            return self._read_file(script_path, paths)
+        except FileNotFoundError:
+            pass
+    
+    def _read_file(self, script_path: str, paths: PathContext) -> QPCBlockBase:
+        abs_path = paths.abspath(script_path)
+        if abs_path in self.read_files:
+            return self.read_files[abs_path]
+        
+        future = self.prefetched.get(abs_path)
+        if future:
+            # any warnings from reading it are printed now, like they would be if it was read here
+            script, warnings = future.result()
+            print_warnings(warnings)
         else:
-            try:
-                script = read_file(script_path)
-                self.read_files[script_path] = script
-                return script
-            except FileNotFoundError:
-                pass
+            script = read_file(script_path, open_path=abs_path)
+        self.read_files[abs_path] = script
+        return script
+
+    # --watch: these files were changed, so read them again the next time they're used
+    def forget_files(self, abs_paths) -> None:
+        for abs_path in abs_paths:
+            self.read_files.pop(abs_path, None)
+            self.prefetched.pop(abs_path, None)
+    
+    # stops the threads reading scripts ahead of time, anything they haven't started reading is dropped
+    # scripts are still read if this parser is used again, just not ahead of time until something is prefetched
+    def close(self) -> None:
+        if self._prefetch_pool:
+            self._prefetch_pool.shutdown(wait=False, cancel_futures=True)
+            self._prefetch_pool = None
+        self.prefetched.clear()
+    
+    # start reading the includes in a script on other threads, so they are already read when the parser gets to them
+    # only includes with nothing left to replace after using these macros are read,
+    # anything read here that the parser doesn't end up using is ignored, along with any warnings from reading it
+    def prefetch_includes(self, script: QPCBlockBase, macros: dict, paths: PathContext, norm_paths: bool = False) -> None:
+        # the parser keeps changing these while the threads are using them
+        self._prefetch_includes(script, Macros(macros), paths.dir, norm_paths)
+    
+    def _prefetch_includes(self, script: QPCBlockBase, macros: dict, base_dir: str, norm_paths: bool) -> None:
+        for include_block in script:
+            # includes that change directory are left for the parser
+            if include_block.key != "include" or len(include_block.values) != 1:
+                continue
+            
+            include_path = replace_macros(include_block.values[0], macros)
+            if "$" in include_path:
+                continue
+            if norm_paths:
+                include_path = os.path.normpath(include_path)
+            
+            abs_path = os.path.normpath(os.path.join(base_dir, include_path))
+            with self._prefetch_lock:
+                if abs_path in self.prefetched:
+                    continue
+                if not self._prefetch_pool:
+                    self._prefetch_pool = ThreadPoolExecutor(PREFETCH_THREADS, "qpc_prefetch")
+                self.prefetched[abs_path] = self._prefetch_pool.submit(
+                    self._prefetch_file, include_path, abs_path, macros, base_dir, norm_paths)
+    
+    def _prefetch_file(self, include_path: str, abs_path: str, macros: dict, base_dir: str, norm_paths: bool):
+        with capture_warnings() as warnings:
+            script = read_file(include_path, open_path=abs_path)
+        self._prefetch_includes(script, macros, base_dir, norm_paths)
+        return script, warnings
     
     # awful
     @staticmethod
-    def _parse_config(config: QPCBlock, project: ProjectPass) -> None:
-        if config.solve_condition(project.macros):
-            for group in config.get_items_cond(project.macros):
-                for option_block in group.get_items_cond(project.macros):
-                    project.config.parse_config_option(group, option_block)
+    def _parse_config(config: QPCBlock, project: ProjectContainer, mask: int) -> None:
+        macros_list = project.get_passes_macros()
+        mask = config.solve_condition_mask(macros_list, mask)
+        for group in config.items:
+            group_mask = group.solve_condition_mask(macros_list, mask)
+            if not group_mask:
+                continue
+            for option_block in group.items:
+                for project_pass in project.get_passes_mask(option_block.solve_condition_mask(macros_list, group_mask)):
+                    project_pass.config.parse_config_option(group, option_block)
@@ -0,0 +1,215 @@
+# Records the wall and cpu time of each phase of a run, for each project, how many times each one happened,
+# and how often the caches used while parsing had what they were asked for
+# only used if --profile is set, writes the results to a json file and prints a summary when qpc finishes
+#
+# times include any phases inside of them, like "lex" is part of "read", and "condition" is part of "parse"
+
+import sys
+import json
+import threading
+from time import perf_counter, thread_time
+from contextlib import contextmanager
+from qpc_args import args
+
+
+# project name used for anything not done for a project, like the base files and master files
+NO_PROJECT = "(none)"
+
+# projects listed in the summary, sorted by time
+SUMMARY_PROJECTS = 15
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.project = NO_PROJECT
+        # project: {phase: [calls, wall, cpu]}
+        self.projects = {}
+        # cache: [hits, misses], see _collect_caches()
+        self.caches = {}
+        self._lock = threading.Lock()
+        # phases each thread is in, so recursive and nested calls of a phase aren't counted twice
+        self._local = threading.local()
+
+    def post_args_init(self):
+        if args.profile:
+            self.enabled = True
+            self._wrap_hot_functions()
+
+    @contextmanager
+    def use_project(self, project: str):
+        previous, self.project = self.project, project
+        try:
+            yield
+        finally:
+            self.project = previous
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled or self._enter(name):
+            yield
+            return
+        start_time, start_cpu = perf_counter(), thread_time()
+        try:
+            yield
+        finally:
+            self._exit(name, perf_counter() - start_time, thread_time() - start_cpu)
+
+    # returns True if this thread is already in this phase
+    def _enter(self, name: str) -> bool:
+        phases = self._local.__dict__.setdefault("phases", set())
+        if name in phases:
+            self._add(name, 0.0, 0.0)
+            return True
+        phases.add(name)
+        return False
+
+    def _exit(self, name: str, wall: float, cpu: float) -> None:
+        self._local.phases.discard(name)
+        self._add(name, wall, cpu)
+
+    def _add(self, name: str, wall: float, cpu: float) -> None:
+        with self._lock:
+            result = self.projects.setdefault(self.project, {}).setdefault(name, [0, 0.0, 0.0])
+            result[0] += 1
+            result[1] += wall
+            result[2] += cpu
+
+    def wrap(self, owner, attr: str, name: str) -> None:
+        function = getattr(owner, attr)
+
+        def wrapper(*arg_list, **kwargs):
+            if self._enter(name):
+                return function(*arg_list, **kwargs)
+            start_time, start_cpu = perf_counter(), thread_time()
+            try:
+                return function(*arg_list, **kwargs)
+            finally:
+                self._exit(name, perf_counter() - start_time, thread_time() - start_cpu)
+
+        # replace it everywhere it was imported to with "from module import function"
+        for module in list(sys.modules.values()):
+            if module is not owner and getattr(module, attr, None) is function:
+                setattr(module, attr, wrapper)
+        setattr(owner, attr, wrapper)
+
+    # these are called too often to time with phase() all the time, so they're only wrapped when profiling
+    def _wrap_hot_functions(self):
+        import qpc_reader
+        import qpc_project
+        import qpc_hash
+        from qpc_base import PathContext
+
+        self.wrap(qpc_reader, "read_file", "read")
+        self.wrap(qpc_reader, "parse_recursive", "lex")
+        self.wrap(qpc_reader, "solve_condition", "condition")
+        self.wrap(qpc_reader, "solve_condition_mask", "condition")
+        self.wrap(qpc_project, "replace_macros", "macros")
+        self.wrap(PathContext, "glob", "glob")
+        self.wrap(qpc_hash, "check_hash", "hash_check")
+
+    # caches count their own hits and misses all the time, since they're checked too often to do it here
+    def _collect_caches(self) -> None:
+        import qpc_project
+        
+        hits, misses = qpc_project.MACRO_CACHE.pop_stats()
+        self._add_cache("macros", hits, misses)
+    
+    def _add_cache(self, name: str, hits: int, misses: int) -> None:
+        with self._lock:
+            result = self.caches.setdefault(name, [0, 0])
+            result[0] += hits
+            result[1] += misses
+
+    # with --jobs, projects are profiled in the worker processes and sent back to the main process with these
+    def pop_results(self) -> tuple:
+        self._collect_caches()
+        with self._lock:
+            projects, caches = self.projects, self.caches
+            self.projects, self.caches = {}, {}
+        return projects, caches
+
+    def merge_results(self, results: tuple) -> None:
+        projects, caches = results
+        for name, (hits, misses) in caches.items():
+            self._add_cache(name, hits, misses)
+        with self._lock:
+            for project, phases in projects.items():
+                project_phases = self.projects.setdefault(project, {})
+                for name, (calls, wall, cpu) in phases.items():
+                    result = project_phases.setdefault(name, [0, 0.0, 0.0])
+                    result[0] += calls
+                    result[1] += wall
+                    result[2] += cpu
+
+    def get_phase_totals(self) -> dict:
+        totals = {}
+        for phases in self.projects.values():
+            for name, (calls, wall, cpu) in phases.items():
+                result = totals.setdefault(name, [0, 0.0, 0.0])
+                result[0] += calls
+                result[1] += wall
+                result[2] += cpu
+        return totals
+
+    # the time spent on a project is the time in the phases that aren't inside of other ones
+    @staticmethod
+    def get_project_time(phases: dict) -> float:
+        return sum(result[1] for name, result in phases.items() if name in {"parse", "hash_check", "write_hash"} or
+                   name.startswith("create_project."))
+
+    def finish(self) -> None:
+        if not self.enabled:
+            return
+
+        def to_dict(phases: dict) -> dict:
+            return {name: {"calls": calls, "wall": round(wall, 6), "cpu": round(cpu, 6)}
+                    for name, (calls, wall, cpu) in sorted(phases.items(), key=lambda item: -item[1][1])}
+
+        self._collect_caches()
+        totals = self.get_phase_totals()
+        projects = sorted(self.projects.items(), key=lambda item: -self.get_project_time(item[1]))
+        results = {
+            "phases": to_dict(totals),
+            "caches": {name: {"hits": hits, "misses": misses, "hit_rate": round(get_hit_rate(hits, misses), 6)}
+                       for name, (hits, misses) in self.caches.items()},
+            "projects": {project: {"wall": round(self.get_project_time(phases), 6), "phases": to_dict(phases)}
+                         for project, phases in projects},
+        }
+        with open(args.profile, mode="w", encoding="utf-8") as profile_file:
+            json.dump(results, profile_file, indent=4)
+
+        self.print_summary(totals, projects)
+
+    def print_summary(self, totals: dict, projects: list) -> None:
+        print("------------------------------------------------------------------------")
+        print(f"Profile written to {args.profile}\n")
+        width = max([len(name) for name in totals] + [5])
+        print(f"{'Phase'.ljust(width)}  {'Wall':>10}  {'CPU':>10}  {'Calls':>10}")
+        for name, (calls, wall, cpu) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            print(f"{name.ljust(width)}  {wall:10.4f}  {cpu:10.4f}  {calls:10}")
+
+        if self.caches:
+            print(f"\n{'Cache'.ljust(width)}  {'Hits':>10}  {'Misses':>10}  {'Hit Rate':>10}")
+            for name, (hits, misses) in self.caches.items():
+                print(f"{name.ljust(width)}  {hits:10}  {misses:10}  {get_hit_rate(hits, misses):10.2%}")
+
+        projects = [(project, phases) for project, phases in projects if project != NO_PROJECT]
+        if not projects:
+            return
+        print(f"\nSlowest projects:")
+        for project, phases in projects[:SUMMARY_PROJECTS]:
+            slowest = sorted(phases.items(), key=lambda item: -item[1][1])[:3]
+            slowest = ", ".join([f"{name} {result[1]:.4f}" for name, result in slowest])
+            print(f"{self.get_project_time(phases):10.4f}  {project}  ({slowest})")
+
+
+def get_hit_rate(hits: int, misses: int) -> float:
+    return hits / (hits + misses) if hits or misses else 0.0
+
+
+PROFILE = Profiler()
+
+
+def post_args_init():
+    PROFILE.post_args_init()
@@ -5,15 +5,18 @@
 # it would probably slow it down as well
 
 import os
-import glob
+import re
 import qpc_hash
 from qpc_reader import solve_condition, read_file, QPCBlock
-from qpc_args import args, get_arg_macros
-from qpc_base import posix_path, norm_path, Platform, Arch, PLATFORM_ARCHS, check_file_path_glob
+from qpc_args import args
+from qpc_base import posix_path, norm_path, Platform, Arch, PLATFORM_ARCHS, PathContext, check_file_path_glob
 from qpc_logging import warning, error, verbose, verbose_color, print_color, Color
 from enum import EnumMeta, Enum, auto
 from time import perf_counter
+from bisect import bisect_right
 from typing import List, Dict
+from collections import OrderedDict
+from collections.abc import MutableMapping
 
 
 # IDEA: be able to reference values from the configuration, like a macro
@@ -88,17 +91,26 @@ class ProjectGroup(BaseInfoProject):
     # group: ProjectGroup
     def contains_group(self, group, folder_list: List[str]):
         self._contains[group] = folder_list.copy()
+        
+    def get_contained_groups(self) -> list:
+        return list(self._contains)
             
-    def finished(self):
+    # adds the projects from the groups this contains, those have to be finished first, see BaseInfo._prepare_groups()
+    # skip_groups are left out, used for groups that end up containing this one
+    def finished(self, skip_groups: set = None):
         for group, group_folder in self._contains.items():
-            group.finished()
+            if skip_groups and group in skip_groups:
+                continue
             for project, folder in group.projects.items():
                 self.add_project(project, [*group_folder, *folder])
 
 
 class SourceFile:
-    def __init__(self, folder_list: list):
-        self.folder = "/".join(folder_list)
+    # shared ones are used by every pass with a file in this folder and no options set on it,
+    # use ProjectPass.edit_source_file() to set options on one
+    def __init__(self, folder: str, shared: bool = False):
+        self.folder = folder
+        self.shared = shared
         self.compiler = SourceFileCompile()
 
 
@@ -118,10 +130,8 @@ class ProjectPass:
         self._glob_files: set = set()
         self.build_events: Dict[str, BuildEvent] = {}
 
-        self.macros: Dict[str, str] = {
-            **container.macros,
-            **self.base_info.macros,
-            
+        # only the macros set in this pass are stored here, the rest are read from the project and base info
+        self.macros: MacroScope = MacroScope({
             "$" + config.upper():   "1",  # this doesn't have to be uppercase, but it's mainly for consistency
             "$" + platform.name:    "1",
             "$" + arch.name:        "1",
@@ -129,7 +139,10 @@ class ProjectPass:
             "$CONFIG":              config,
             "$PLATFORM":            platform.name,
             "$ARCH":                arch.name,
-        }
+        }, container.get_base_macros(self.base_info))
+        # macros with a "$" still in their value, that could use a macro set later, see _replace_undefined_macros()
+        # None until a macro is first set, since the ones from the base info haven't been replaced in this pass yet
+        self._unresolved_macros: Dict[str, None] = None
         
         self.generators = set()
         self.add_generator(gen_macro, gen_id)
@@ -159,71 +172,134 @@ class ProjectPass:
     def _set_macro(self, indent: str, macro_name: str, macro_value: str = ""):
         self.macros[macro_name] = macro_value
         verbose_color(Color.DGREEN, f"{indent}    Set Macro: {macro_name} = \"{self.macros[macro_name]}\"")
-        self._replace_undefined_macros(indent)
-
-    def _replace_undefined_macros(self, indent: str) -> None:
-        # this could probably be sped up
-        # TODO: add scanning of files and certain config info
-        for macro, value in self.macros.items():
-            if args.verbose:
-                old_value = self.macros[macro]
-                self.macros[macro] = replace_macros(value, self.macros)
-                if old_value != self.macros[macro]:
-                    verbose_color(Color.GREEN,
-                                  f"{indent}    Updated Macro: {macro} - \"{old_value}\" -> \"{self.macros[macro]}\"")
+        
+        if self._unresolved_macros is None:
+            self._unresolved_macros = {macro: None for macro, value in self.macros.items() if "$" in value}
+            self._replace_undefined_macros(indent, macro_name, list(self._unresolved_macros))
+        else:
+            if "$" in macro_value:
+                self._unresolved_macros[macro_name] = None
             else:
-                self.macros[macro] = replace_macros(value, self.macros)
+                self._unresolved_macros.pop(macro_name, None)
+            self._replace_undefined_macros(indent, macro_name, [macro_name])
+
+    # only macros using a macro that changed can change, and then anything using those,
+    # so only those are replaced again, with the ones they use replaced first
+    # TODO: add scanning of files and certain config info
+    def _replace_undefined_macros(self, indent: str, macro_name: str, changed_macros: list) -> None:
+        order, loop = self._get_macro_order(changed_macros)
+        
+        # anything in a loop would keep growing each time it's replaced, so it's left alone
+        if macro_name in loop:
+            warning(f"Macros use each other, not replacing them: {', '.join(loop)}")
+        
+        table = self.macros.get_table()
+        for macro in order:
+            old_value = self.macros[macro]
+            # a macro's own name is left in its value, like "$OUT" in "$OUT_BASE" before $OUT_BASE is set
+            self.macros[macro] = table.replace(old_value, self.macros, macro)
+            if "$" not in self.macros[macro]:
+                self._unresolved_macros.pop(macro, None)
+            if args.verbose and old_value != self.macros[macro]:
+                verbose_color(Color.GREEN,
+                              f"{indent}    Updated Macro: {macro} - \"{old_value}\" -> \"{self.macros[macro]}\"")
+    
+    # returns the macros using any of these, in the order to replace them in,
+    # and the ones that can't be ordered since they use each other, or use one that does
+    def _get_macro_order(self, changed_macros: list) -> tuple:
+        # the names in each value, found the same way replace_macros() finds them,
+        # so "$OUT" isn't used by "$OUT_BASE/bin" once there's a $OUT_BASE, and a macro never uses its own name
+        table = self.macros.get_table()
+        names_used = {}
+        for macro in self._unresolved_macros:
+            names_used[macro] = {name for start, name in table.find(self.macros[macro])}
+            names_used[macro].discard(macro)
+        
+        # usually only the macro just set still has a "$" in it, so there's nothing to order
+        if len(names_used) == 1:
+            [(macro, names)] = names_used.items()
+            return [macro] if macro in changed_macros or names.intersection(changed_macros) else [], []
+        
+        uses = {}
+        check = list(changed_macros)
+        while check:
+            used = check.pop()
+            for macro, names in names_used.items():
+                if used in names:
+                    if macro not in uses:
+                        uses[macro] = set()
+                        check.append(macro)
+                    uses[macro].add(used)
+        
+        for macro in changed_macros:
+            if macro in self._unresolved_macros and macro not in uses:
+                uses[macro] = set()
+        
+        if not uses:
+            return [], []
+        
+        # only what's being replaced has to be done first
+        [macro_uses.intersection_update(uses) for macro_uses in uses.values()]
+        
+        # in the order they were set in otherwise, like replacing every macro does
+        if len(uses) > 1:
+            uses = {macro: uses[macro] for macro in self.macros if macro in uses}
+        order = []
+        ready = [macro for macro, macro_uses in uses.items() if not macro_uses]
+        while ready:
+            done = ready.pop(0)
+            order.append(done)
+            del uses[done]
+            for macro, macro_uses in uses.items():
+                if done in macro_uses:
+                    macro_uses.remove(done)
+                    if not macro_uses:
+                        ready.append(macro)
+        
+        return order, list(uses)
             
     def replace_macros(self, string: str) -> str:
-        return replace_macros(string, self.macros)
+        return MACRO_CACHE.replace(string, self.macros)
         
     def replace_macros_list(self, *values) -> list:
-        return replace_macros_list(self.macros, *values)
+        return [MACRO_CACHE.replace(value, self.macros) for value in values]
     
+    # globs, file types and checking if files exist are the same for every pass, so the container handles those
     def add_file(self, folder_list: list, file_block: QPCBlock) -> None:
+        folder = "/".join(folder_list)
         for file_path in file_block.get_list():
             file_path = self.replace_macros(file_path)
             if check_file_path_glob(file_path):
-                self._add_file_glob(folder_list, file_path, file_block)
-            else:
-                self._add_file_internal(folder_list, file_path, file_block)
+                self._glob_files.add(file_path)
+            for found_file, is_source_file in self.container.get_file_paths(file_path):
+                self._add_file_internal(folder, found_file, is_source_file, file_block)
     
     def remove_file(self, folder_list: list, file_block: QPCBlock) -> None:
         for file_path in file_block.values:
             file_path = self.replace_macros(file_path)
-
             if check_file_path_glob(file_path):
-                self._remove_file_glob(folder_list, file_path, file_block)
-            else:
-                self._remove_file_internal(folder_list, file_path, file_block)
-
-    def _add_file_glob(self, folder_list: list, file_path: str, file_block: QPCBlock) -> None:
-        self._glob_files.add(file_path)
-        [self._add_file_internal(folder_list, found_file, file_block) for found_file in glob.glob(file_path)]
-
-    def _remove_file_glob(self, folder_list: list, file_path: str, file_block: QPCBlock) -> None:
-        self._glob_files.add(file_path)
-        [self._remove_file_internal(folder_list, found_file, file_block) for found_file in glob.glob(file_path)]
+                self._glob_files.add(file_path)
+            for found_file, is_source_file in self.container.get_file_paths(file_path):
+                self._remove_file_internal(found_file, is_source_file, file_block)
 
-    def _add_file_internal(self, folder_list: list, file_path: str, file_block: QPCBlock):
+    def _add_file_internal(self, folder: str, file_path: str, is_source_file: bool, file_block: QPCBlock):
         build = file_block.get_item("build")
         force_src_file = build and build.solve_condition(self.macros) and build.values and build.values[0] == "true"
-        if force_src_file or os.path.splitext(file_path)[1] in EXTS_C:
+        if force_src_file or is_source_file:
             if not self._check_file_added(file_path, file_block, self.source_files):
-                self.source_files[file_path] = SourceFile(folder_list)
+                self.source_files[file_path] = self.container.get_shared_source_file(folder)
         elif not self._check_file_added(file_path, file_block, self.files):
-            self.files[file_path] = "/".join(folder_list)
+            self.files[file_path] = folder
 
-    @staticmethod
-    def _check_file_added(file_path: str, file_block: QPCBlock, file_dict: dict) -> bool:
+    def _check_file_added(self, file_path: str, file_block: QPCBlock, file_dict: dict) -> bool:
         if file_path in file_dict:
             file_block.warning("File already added: " + file_path)
             return True
         else:
-            return not check_if_file_exists(file_path, file_block.warning)
+            return not self.container.check_file_exists(file_path, file_block.warning)
                 
-    def _remove_file_internal(self, folder_list: list, file_path: str, file_block: QPCBlock):
-        if os.path.splitext(file_path)[1] in EXTS_C:
+    def _remove_file_internal(self, file_path: str, is_source_file: bool, file_block: QPCBlock):
+        if is_source_file:
             if file_path in self.source_files:
                 del self.source_files[file_path]
             else:
@@ -265,12 +341,13 @@ class ProjectPass:
                     if block.items:
                         for file_path in block.get_list():
                             if check_file_path_glob(file_path):
-                                [self.parse_source_file(block, found_file) for found_file in glob.glob(file_path)]
+                                [self.parse_source_file(block, found_file) for found_file in
+                                 self.container.paths.glob(file_path)]
                             else:
                                 self.parse_source_file(block, file_path)
 
     def parse_source_file(self, files_block: QPCBlock, file_path: str):
-        source_file = self.get_source_file(file_path)
+        source_file = self.edit_source_file(file_path)
         if not source_file:
             return
     
@@ -347,6 +424,14 @@ class ProjectPass:
         file_path = self.replace_macros(file_path)
         if file_path in self.source_files:
             return self.source_files[file_path]
+    
+    # same as get_source_file, but gives this pass it's own copy if it's shared with other passes
+    def edit_source_file(self, file_path) -> SourceFile:
+        file_path = self.replace_macros(file_path)
+        source_file = self.source_files.get(file_path)
+        if source_file and source_file.shared:
+            source_file = self.source_files[file_path] = SourceFile(source_file.folder)
+        return source_file
         
     def get_glob_files(self) -> set:
         return self._glob_files
@@ -354,18 +439,24 @@ class ProjectPass:
 
 class ProjectContainer:
     # base_info is BaseInfo from qpc_parser.py
-    def __init__(self, name: str, project_path: str, base_info, project_def: ProjectDefinition, generator_list: list):
+    # paths is the project directory, paths in the scripts and the generated files are relative to it
+    def __init__(self, name: str, project_path: str, base_info, project_def: ProjectDefinition, generator_list: list,
+                 paths: PathContext):
         self.file_name = name  # the actual file name
+        self.paths = paths
         self.project_path = project_path  # should use the macro instead tbh, might remove
         self.out_dir = os.path.split(project_path)[0]
-        self.hash_dict: Dict[str, str] = {}
+        self.hash_dict: Dict[str, str] = {}  # from the last time this was parsed, see add_previous_hash()
+        self._previous_glob_files: set = set()
         self.base_info = base_info
         
         # self.dependency_convert = dependency_dict
-        self.dependencies = set()
+        # dict instead of a set to keep the order they were added in, so it's the same in every process with --jobs
+        self.dependencies: Dict[str, None] = {}
         # shared across configs, used as a base for them
         root_dir = "/".join([".."] * len(self.out_dir.split("/")))
         
+        # the macros from the command line are in the base info, see get_base_macros()
         self.macros = {
             "$PROJECT_NAME": name,
             "$PROJECT_DIR": self.out_dir,
@@ -376,9 +467,13 @@ class ProjectContainer:
             # changed whenever a script is included
             "$SCRIPT_NAME": name,
             "$SCRIPT_DIR": self.out_dir,
-            
-            **get_arg_macros()
         }
+        self._base_macros: Dict[Platform, MacroScope] = {}
+        
+        # shared by every pass, filled in as they are used, see get_file_paths(), get_shared_source_file() and check_file_exists()
+        self._file_paths: Dict[str, tuple] = {}
+        self._files_exist: Dict[str, bool] = {}
+        self._source_files: Dict[str, SourceFile] = {}
         
         self._passes: List[ProjectPass] = []
         generator_macros = {}
@@ -396,6 +491,13 @@ class ProjectContainer:
                             if arch in args.archs:
                                 self.add_pass(config, platform, arch, macro, generator.id)
         
+    # the macros of this project on top of the ones from the base info, shared by every pass on its platform
+    def get_base_macros(self, base_info) -> "MacroScope":
+        macros = self._base_macros.get(base_info.platform)
+        if macros is None:
+            macros = self._base_macros[base_info.platform] = MacroScope(self.macros, base_info.macros)
+        return macros
+    
     def add_pass(self, config: str, plat: Platform, arch: Arch, macro: str, gen_id: int):
         # if not any existing passes without a generator macro
         if not any(proj_pass.check_pass(config, plat, arch, macro, gen_id) for proj_pass in self._passes):
@@ -410,6 +512,39 @@ class ProjectContainer:
     def get_passes(self, gen_id: int) -> list:
         return [project_pass for project_pass in self._passes if gen_id in project_pass.generators]
 
+    # every file a path in a script matches after macros are replaced, and if each one is a source file
+    def get_file_paths(self, file_path: str) -> tuple:
+        file_paths = self._file_paths.get(file_path)
+        if file_paths is None:
+            found_files = self.paths.glob(file_path) if check_file_path_glob(file_path) else (file_path,)
+            file_paths = tuple([(found_file, os.path.splitext(found_file)[1] in EXTS_C) for found_file in found_files])
+            self._file_paths[file_path] = file_paths
+        return file_paths
+    
+    def get_shared_source_file(self, folder: str) -> SourceFile:
+        if folder not in self._source_files:
+            self._source_files[folder] = SourceFile(folder, True)
+        return self._source_files[folder]
+    
+    def check_file_exists(self, file_path: str, option_warning: classmethod) -> bool:
+        if args.check_files:
+            if file_path not in self._files_exist:
+                self._files_exist[file_path] = self.paths.isfile(file_path)
+            if not self._files_exist[file_path]:
+                option_warning("File does not exist: ")
+                return False
+        return True
+
+    # masks have bit N set for self._passes[N], used for parsing every pass at once
+    def get_all_passes_mask(self) -> int:
+        return (1 << len(self._passes)) - 1
+
+    def get_passes_mask(self, mask: int) -> list:
+        return [project_pass for index, project_pass in enumerate(self._passes) if mask >> index & 1]
+
+    def get_passes_macros(self) -> list:
+        return [project_pass.macros for project_pass in self._passes]
+
     def get_platforms(self) -> list:
         platforms = set()
         [platforms.add(project_pass.platform) for project_pass in self._passes]
@@ -423,12 +558,20 @@ class ProjectContainer:
     def get_hashes(self) -> dict:
         hash_dict = {}
         [hash_dict.update(**project_pass.hash_list) for project_pass in self._passes]
-        return hash_dict
+        return {**self.hash_dict, **hash_dict}
     
     def get_glob_files(self) -> list:
-        glob_files = set()
+        glob_files = set(self._previous_glob_files)
         [glob_files.update(project.get_glob_files()) for project in self._passes]
         return list(glob_files)
+    
+    # passes are only made for the generators creating this project, so when that's not all of them,
+    # anything only the other passes found is added from the last hash, the scripts haven't changed since then
+    def add_previous_hash(self, hashes: dict, glob_files: list, dependencies: list) -> None:
+        self.hash_dict.update(hashes)
+        self._previous_glob_files.update(glob_files)
+        # sorted, the order in the hash file is different in each process
+        [self.dependencies.setdefault(dependency, None) for dependency in sorted(dependencies)]
 
     @staticmethod
     def _add_dependency_ext(qpc_path: str) -> str:
@@ -439,12 +582,12 @@ class ProjectContainer:
     def add_dependency(self, qpc_path: str) -> None:
         qpc_path = self._add_dependency_ext(qpc_path)
         if qpc_path != self.project_path:
-            self.dependencies.add(qpc_path)
+            self.dependencies[qpc_path] = None
 
     def remove_dependency(self, qpc_path: str) -> None:
         qpc_path = self._add_dependency_ext(qpc_path)
         if qpc_path in self.dependencies:
-            self.dependencies.remove(qpc_path)
+            del self.dependencies[qpc_path]
 
     def add_dependencies(self, *qpc_paths) -> None:
         map(self.add_dependency, qpc_paths)
@@ -465,7 +608,7 @@ class ProjectContainer:
         return folder_paths
 
     def get_display_name(self) -> str:
-        return self._passes[0].macros["$PROJECT_NAME"]
+        return self._passes[0].macros["$PROJECT_NAME"] if self._passes else self.macros["$PROJECT_NAME"]
 
     def get_out_dir(self) -> str:
         out_dir = ""  # os.path.split(project.project_path)[0]
@@ -533,7 +676,7 @@ class Configuration:
         event_args = replace_macros_list(self._proj.macros, *arg_list)
         for index, event_macro in enumerate(event_args):
             if check_file_path_glob(event_macro):
-                files = glob.glob(event_macro, recursive=True)
+                files = self._proj.container.paths.glob(event_macro, recursive=True)
                 [self._parse_build_step_call(step, event, file) for file in files]
             else:
                 self._parse_build_step_call(step, event, event_macro)
@@ -590,7 +733,7 @@ class Debug:
 
 
 def clean_path(string: str, macros: dict) -> str:
-    return posix_path(replace_macros(string, macros))
+    return posix_path(MACRO_CACHE.replace(string, macros))
 
 
 class General:
@@ -851,14 +994,6 @@ class BuildEvent:
                 step.extend(line)
         
         
-def check_if_file_exists(file_path: str, option_warning: classmethod) -> bool:
-    if args.check_files:
-        if not os.path.isfile(file_path):
-            option_warning("File does not exist: ")
-            return False
-    return True
-
-
 def split_folders(path_list):
     full_folder_paths = set()
     
@@ -886,11 +1021,356 @@ def replace_macros_list(macros, *value_list):
 
 def replace_macros(string: str, macros: Dict[str, str]):
     if "$" in string:
-        potential_macros = [macro for macro in macros if macro in string]
-        while potential_macros:
-            # use the longest length macros to shortest
-            best_macro = max(potential_macros, key=len)
-            if best_macro in string:
-                string = string.replace(best_macro, macros[best_macro])
-            potential_macros.remove(best_macro)
+        table = macros.get_table() if type(macros) in (Macros, MacroScope) else get_macro_table(macros)
+        return table.replace(string, macros)
     return string
+
+
+# replaces every macro in the string, from the longest to the shortest, one at a time
+# this is what MacroTable.replace() has to match, and what it uses when it can't
+def _replace_macros_ordered(string: str, macros: Dict[str, str]):
+    potential_macros = [macro for macro in macros if macro in string]
+    while potential_macros:
+        # use the longest length macros to shortest
+        best_macro = max(potential_macros, key=len)
+        if best_macro in string:
+            string = string.replace(best_macro, macros[best_macro])
+        potential_macros.remove(best_macro)
+    return string
+
+
+# a "$" and the letters, numbers and "_" after it
+_MACRO_WORD = re.compile(r"\$\w*")
+
+
+# the names of some macros, and how to find the longest one at each "$", so a string is replaced in a single scan
+# the values are looked up when replacing, so this only has to be made again when a macro is added or removed
+# that happens each time a project or pass sets a new macro, so anything slow to make is left until it's used
+class MacroTable:
+    # base is a table with some of these names, like the one for the macros under a MacroScope,
+    # so only the names added to it have to be checked
+    def __init__(self, names: frozenset, base=None):
+        self.names = names
+        added = names - base.names if base else names
+        # a "$" and then no other "$", anything else is replaced one macro at a time
+        self.simple = (not base or base.simple) and \
+            all(name.startswith("$") and "$" not in name[1:] for name in added)
+        # a "$" and then only letters, numbers and "_", like nearly every macro, see find()
+        self.words = self.simple and (not base or base.words) and all(_MACRO_WORD.fullmatch(name) for name in added)
+        # the lengths of the names, longest first, see find()
+        self.lengths = sorted({len(name) for name in added}.union(base.lengths if base else ()), reverse=True)
+        # see is_prefix() and get_regex()
+        self._sorted_names = None
+        self._regex = None
+    
+    # returns where each name replace() would use starts in the string, and the name, from the start of it
+    # a simple name can't go past the next "$", so only the longest name at each "$" has to be found
+    def find(self, string: str) -> list:
+        if not self.simple:
+            return [(match.start(), match.group()) for match in self.get_regex().finditer(string)]
+        
+        found = []
+        # and if they're all words, it's the longest one the word at each "$" starts with
+        if self.words and self.names:
+            for match in _MACRO_WORD.finditer(string):
+                name = match.group()[:self.lengths[0]]
+                while name and name not in self.names:
+                    name = name[:-1]
+                if name:
+                    found.append((match.start(), name))
+            return found
+        
+        start = string.find("$")
+        while start != -1:
+            end = string.find("$", start + 1)
+            part = string[start:end] if end != -1 else string[start:]
+            for length in self.lengths:
+                if length <= len(part) and part[:length] in self.names:
+                    found.append((start, part[:length]))
+                    break
+            start = end
+        return found
+    
+    # is this the start of a longer name
+    def is_prefix(self, string: str) -> bool:
+        # like the "$ROOT_DIR/" before $NAME in "$ROOT_DIR/$NAME", without sorting the names for it
+        if not string or self.words and not _MACRO_WORD.fullmatch(string):
+            return False
+        if self._sorted_names is None:
+            self._sorted_names = sorted(self.names)
+        # any names starting with it are sorted right after it
+        index = bisect_right(self._sorted_names, string)
+        return index < len(self._sorted_names) and self._sorted_names[index].startswith(string)
+    
+    # the names compiled into one regex, for names find() can't split at each "$"
+    def get_regex(self):
+        if self._regex is None:
+            self._regex = re.compile(_get_trie_pattern(self.names))
+        return self._regex
+    
+    # skip is the name of a macro to leave in the string, see ProjectPass._replace_undefined_macros()
+    def replace(self, string: str, macros: Dict[str, str], skip: str = None) -> str:
+        if skip and skip in string:
+            # the parts around it are replaced on their own, so nothing in it is replaced when it's done one at a time
+            starts = [start for start, name in self.find(string) if name == skip]
+            if starts:
+                ends = [0] + [start + len(skip) for start in starts]
+                parts = [string[end:start] for end, start in zip(ends, starts + [len(string)])]
+                return skip.join([self.replace(part, macros) for part in parts])
+        
+        if not self.simple:
+            return _replace_macros_ordered(string, macros)
+        
+        parts = []
+        end = 0
+        for start, name in self.find(string):
+            value = macros[name]
+            # a macro in a value is only replaced if it was in the string already and is shorter,
+            # and in "$A$B", replacing $B first could make a longer macro starting at $A,
+            # in both cases the result depends on the order macros are replaced in, so it's done that way instead
+            if "$" in value or self.is_prefix(string[string.rfind("$", 0, start):start]):
+                return _replace_macros_ordered(string, macros)
+            parts.append(string[end:start])
+            parts.append(value)
+            end = start + len(name)
+        
+        if not parts:
+            return string
+        parts.append(string[end:])
+        return "".join(parts)
+    
+    # the names replace() would use in the string, in order, or None if that depends on more than their values
+    # the result only depends on the string and these, so MacroCache can share it between tables
+    def get_names_used(self, string: str):
+        if not self.simple:
+            return None
+        
+        names = []
+        for start, name in self.find(string):
+            if self.is_prefix(string[string.rfind("$", 0, start):start]):
+                return None
+            names.append(name)
+        return tuple(names)
+
+
+# the names as a tree of characters, so a match only checks the characters after it, not every name
+# longer names are tried first at each character, so it always matches the longest name it can
+def _get_trie_pattern(names) -> str:
+    trie = {}
+    for name in names:
+        node = trie
+        for char in name:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    return _get_trie_node_pattern(trie)
+
+
+def _get_trie_node_pattern(node: dict) -> str:
+    branches = [re.escape(char) + _get_trie_node_pattern(child) for char, child in node.items() if char]
+    if "" in node:
+        return "(?:" + "|".join(branches) + "|)" if branches else ""
+    return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+
+# the most tables kept in _MACRO_TABLES
+MACRO_TABLES_SIZE = 256
+
+# names: MacroTable, the same names are used by every pass of every project, so they share one
+# the least recently used tables are removed when it's full, each new macro set in a project makes another one
+_MACRO_TABLES = OrderedDict()
+
+
+def get_macro_table(macros: Dict[str, str], base: MacroTable = None) -> MacroTable:
+    names = frozenset(macros)
+    table = _MACRO_TABLES.get(names)
+    if table is None:
+        table = _MACRO_TABLES[names] = MacroTable(names, base)
+        if len(_MACRO_TABLES) > MACRO_TABLES_SIZE:
+            _MACRO_TABLES.popitem(last=False)
+    else:
+        _MACRO_TABLES.move_to_end(names)
+    return table
+
+
+# a dict of macros that keeps its MacroTable until a macro is added or removed
+class Macros(dict):
+    __slots__ = ("_table",)
+    
+    def __init__(self, *macros, **kwargs):
+        super().__init__(*macros, **kwargs)
+        self._table = None
+    
+    def get_table(self) -> MacroTable:
+        if self._table is None:
+            self._table = get_macro_table(self)
+        return self._table
+    
+    def __setitem__(self, name: str, value: str):
+        if name not in self:
+            self._table = None
+        super().__setitem__(name, value)
+    
+    def __delitem__(self, name: str):
+        super().__delitem__(name)
+        self._table = None
+    
+    def update(self, *macros, **kwargs):
+        count = len(self)
+        super().update(*macros, **kwargs)
+        if len(self) != count:
+            self._table = None
+    
+    def setdefault(self, name: str, value: str = None):
+        if name not in self:
+            self._table = None
+        return super().setdefault(name, value)
+    
+    def pop(self, name: str, *default):
+        self._table = None
+        return super().pop(name, *default)
+    
+    def popitem(self):
+        self._table = None
+        return super().popitem()
+    
+    def clear(self):
+        super().clear()
+        self._table = None
+    
+    def copy(self):
+        macros = Macros(self)
+        macros._table = self._table
+        return macros
+
+
+# macros layered on top of other macros without copying them, like a pass on top of its project and platform
+# reading a macro checks this layer and then the ones under it, setting one only changes this layer
+# the layers under it can change values, but shouldn't add or remove macros after this is made, see get_table()
+class MacroScope(MutableMapping):
+    __slots__ = ("macros", "parent", "_layers", "_table")
+    
+    # macros is used as this layer, parent is Macros or another MacroScope
+    def __init__(self, macros: dict, parent):
+        self.macros = macros
+        self.parent = parent
+        # every layer from the top down
+        self._layers = (macros, *parent._layers) if type(parent) is MacroScope else (macros, parent)
+        self._table = None
+    
+    def get_table(self) -> MacroTable:
+        if self._table is None:
+            parent_table = self.parent.get_table()
+            self._table = get_macro_table(parent_table.names.union(self.macros), parent_table)
+        return self._table
+    
+    def __getitem__(self, name: str) -> str:
+        for layer in self._layers:
+            if name in layer:
+                return layer[name]
+        raise KeyError(name)
+    
+    def get(self, name: str, default=None):
+        for layer in self._layers:
+            if name in layer:
+                return layer[name]
+        return default
+    
+    def __contains__(self, name: str) -> bool:
+        for layer in self._layers:
+            if name in layer:
+                return True
+        return False
+    
+    # a new macro adds its name to the table this layer already has, instead of making one from every name again
+    def __setitem__(self, name: str, value: str):
+        if self._table and name not in self._table.names:
+            self._table = get_macro_table(self._table.names.union((name,)), self._table)
+        self.macros[name] = value
+    
+    # only macros set in this layer can be removed
+    def __delitem__(self, name: str):
+        del self.macros[name]
+        self._table = None
+    
+    # in the same order as if every layer was merged into one dict, from the bottom up
+    def __iter__(self):
+        yield from self.parent
+        for name in self.macros:
+            if name not in self.parent:
+                yield name
+    
+    def __len__(self) -> int:
+        return len(self.parent) + sum(name not in self.parent for name in self.macros)
+    
+    # every layer merged into one dict, instead of looking up each name through the layers
+    def items(self):
+        merged = {}
+        for layer in reversed(self._layers):
+            merged.update(layer)
+        return merged.items()
+
+
+# the most results, and names found in strings, kept in MACRO_CACHE
+MACRO_CACHE_SIZE = 16384
+
+
+# results of replacing macros in a string, shared by every pass and project with the same values for the macros
+# the string uses, like "$ROOT_DIR/include" in every pass of projects in the same directory
+# the least recently used results are removed when it's full
+class MacroCache:
+    def __init__(self, size: int):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        # (string, names used, their values): string with the macros replaced
+        self._results = OrderedDict()
+        # (string, names in the table): names used in the string, see MacroTable.get_names_used()
+        self._names_used = OrderedDict()
+    
+    def replace(self, string: str, macros: Dict[str, str]) -> str:
+        if "$" not in string:
+            return string
+        
+        table = macros.get_table() if type(macros) in (Macros, MacroScope) else get_macro_table(macros)
+        names = self._get_names_used(string, table)
+        if names is None:
+            self.misses += 1
+            return replace_macros(string, macros)
+        
+        values = tuple([macros[name] for name in names])
+        key = (string, names, values)
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+            self.hits += 1
+            return result
+        
+        self.misses += 1
+        result = replace_macros(string, macros)
+        # a "$" in a value means other macros could be replaced in it too, see MacroTable.replace()
+        if not any(["$" in value for value in values]):
+            self._results[key] = result
+            if len(self._results) > self.size:
+                self._results.popitem(last=False)
+        return result
+    
+    def _get_names_used(self, string: str, table: MacroTable):
+        key = (string, table.names)
+        names = self._names_used.get(key, False)
+        if names is not False:
+            self._names_used.move_to_end(key)
+            return names
+        
+        names = self._names_used[key] = table.get_names_used(string)
+        if len(self._names_used) > self.size:
+            self._names_used.popitem(last=False)
+        return names
+    
+    # returns the hits and misses since the last call, see qpc_profile
+    def pop_stats(self) -> tuple:
+        stats = (self.hits, self.misses)
+        self.hits = self.misses = 0
+        return stats
+
+
+MACRO_CACHE = MacroCache(MACRO_CACHE_SIZE)
@@ -4,9 +4,14 @@
 from __future__ import annotations
 
 import os
+from sys import intern
 from typing import List
 from re import compile
+from codecs import getincrementaldecoder
+import mmap
+import qpc_logging
 from qpc_logging import warning, error, warning_no_line, verbose, verbose_color, print_color, Color
+from qpc_cache import PARSE_CACHE
 
 
 def posix_path(string: str) -> str:
@@ -16,10 +21,19 @@ def posix_path(string: str) -> str:
 COND_OPERATORS = compile('(\\(|\\)|\\|\\||\\&\\&|>=|<=|==|!=|>|<)')
 
 
+# shared by every block with no items, most blocks never have any, so a list is only made when one is added
+_NO_ITEMS = ()
+
+
 class QPCBlockBase:
+    # there can be a lot of these loaded at once, so no __dict__ on them
+    __slots__ = ("file_path", "items", "_key_index", "_key_index_len")
+    
     def __init__(self, file_path: str = ""):
-        self.file_path = file_path
-        self.items = []
+        self.file_path = intern(file_path)
+        self.items = _NO_ITEMS
+        self._key_index = None
+        self._key_index_len = 0
     
     # temp stuff until i setup the rest for this later
     def __iter__(self):
@@ -28,54 +42,81 @@ class QPCBlockBase:
     def __getitem__(self, item):
         return self.items[item]
     
+    # anything that changes items has to go through this, so the key index gets rebuilt
+    def _item_list(self) -> list:
+        self._key_index = None
+        if self.items is _NO_ITEMS:
+            self.items = []
+        return self.items
+    
+    def _get_key_index(self) -> dict:
+        # also check the length in case something changed items directly
+        if self._key_index is None or self._key_index_len != len(self.items):
+            key_index = {}
+            for item in self.items:
+                if item.key in key_index:
+                    key_index[item.key].append(item)
+                else:
+                    key_index[item.key] = [item]
+            self._key_index = key_index
+            self._key_index_len = len(self.items)
+        return self._key_index
+    
     def extend(self, item):
-        self.items.extend(item)
+        self._item_list().extend(item)
     
     def append(self, item):
-        self.items.append(item)
+        self._item_list().append(item)
     
     def remove(self, item):
-        self.items.remove(item)
+        self._item_list().remove(item)
     
     def index(self, item):
         self.items.index(item)
     
     def to_string(self, quote_keys=False, quote_values=False, break_multi_value=False, break_on_key=False):
-        final_string = ""
-        for item in self.items:
-            final_string += item.to_string(0, quote_keys, quote_values, break_multi_value, break_on_key) + "\n"
-        return final_string
+        chunks = []
+        self._write_items(chunks.append, 0, (quote_keys, quote_values, break_multi_value, break_on_key))
+        return "".join(chunks)
+    
+    # writes the same thing as to_string, but straight into a file
+    def write_to(self, fp, quote_keys=False, quote_values=False, break_multi_value=False, break_on_key=False):
+        self._write_items(fp.write, 0, (quote_keys, quote_values, break_multi_value, break_on_key))
+    
+    def _write_items(self, write, depth: int, options: tuple):
+        items = self.items
+        for index, item in enumerate(items):
+            item._write(write, depth, index, items, options)
+            write("\n")
     
     def add_item(self, key: str, values: list, condition: str = "", line_num: int = 0):
         if type(values) == str:
             values = [values]
         sub_qpc = QPCBlock(self, key, values, condition, file_path=self.file_path, line_num=line_num)
-        self.items.append(sub_qpc)
+        self._item_list().append(sub_qpc)
         return sub_qpc
     
     def add_item_index(self, index: int, key: str, values: list, condition: str = "", line_num: int = 0):
         sub_qpc = QPCBlock(self, key, values, condition, file_path=self.file_path, line_num=line_num)
-        self.items.insert(index, sub_qpc)
+        self._item_list().insert(index, sub_qpc)
         return sub_qpc
     
     def get_item(self, item_key):
-        for item in self.items:
-            if item.key == item_key:
-                return item
-        return None
+        if not self.items:
+            return None
+        items = self._get_key_index().get(item_key)
+        return items[0] if items else None
     
     def get_item_values(self, item_key) -> list:
-        for item in self.items:
-            if item.key == item_key:
-                return item.values
-        return []
+        if not self.items:
+            return []
+        items = self._get_key_index().get(item_key)
+        return items[0].values if items else []
     
     def get_items(self, item_key) -> List[QPCBlock]:
-        items = []
-        for item in self.items:
-            if item.key == item_key:
-                items.append(item)
-        return items
+        if not self.items:
+            return []
+        return list(self._get_key_index().get(item_key, ()))
     
     def get_items_cond(self, macros: dict) -> List[QPCBlock]:
         items: list = []
@@ -123,22 +164,38 @@ class QPCBlockBase:
 
 
 class QPCBlock(QPCBlockBase):
+    __slots__ = ("parent", "key", "values", "condition", "line_num")
+    
     def __init__(self, parent, key, values, condition: str = "", file_path: str = "", line_num: int = 0):
-        super().__init__(file_path)
+        # keys, conditions and file paths are repeated constantly, so only store one copy of each
+        self.file_path = intern(file_path)
+        self.items = _NO_ITEMS
+        self._key_index = None
+        self._key_index_len = 0
         self.parent = parent
-        self.key = key
+        self.key = intern(key)
         self.values = values
-        self.condition = condition
+        self.condition = intern(condition)
         self.line_num = line_num
     
     def to_string(self, depth=0, quote_keys=False, quote_values=False, break_multi_value=False, break_on_key=False):
-        indent = "{0}".format(depth * '\t')
-        index = self.parent.items.index(self)
+        chunks = []
+        self._write(chunks.append, depth, self.parent.items.index(self), self.parent.items,
+                    (quote_keys, quote_values, break_multi_value, break_on_key))
+        return "".join(chunks)
+    
+    # siblings is the items list of the parent, and index is where this block is in it
+    def _write(self, write, depth: int, index: int, siblings: list, options: tuple):
+        quote_keys, quote_values, break_multi_value, break_on_key = options
+        indent = depth * '\t'
+        
+        if self.items and 0 < index < len(siblings) and not siblings[index - 1].items:
+            write("\n")
         
         if quote_keys:
-            string = "{0}\"{1}\"".format(indent, self.key)
+            write("{0}\"{1}\"".format(indent, self.key))
         else:
-            string = indent + self.key
+            write(indent + self.key)
         
         if break_on_key:
             key_indent = 0
@@ -157,30 +214,23 @@ class QPCBlock(QPCBlockBase):
                                           formatted_value[-1]
                 
                 if quote_values:
-                    string += " \"{0}\"".format(formatted_value)
+                    write(" \"{0}\"".format(formatted_value))
                 else:
-                    string += " {0}".format(formatted_value)
+                    write(" {0}".format(formatted_value))
                 # untested
                 if break_multi_value and value_index < len(self.values):
-                    string += " \\\n{0}{1}".format(indent, " " * key_indent)
+                    write(" \\\n{0}{1}".format(indent, " " * key_indent))
         
         if self.condition:
-            string += " [" + add_spacing_to_condition(self.condition) + "]"
+            write(" [" + add_spacing_to_condition(self.condition) + "]")
         
         if self.items:
-            if 0 < index < len(self.parent.items):
-                if not self.parent.items[index - 1].items:
-                    string = "\n" + string
-            
-            string += "\n" + indent + "{\n"
-            for item in self.items:
-                string += item.to_string(depth + 1, quote_keys, quote_values, break_multi_value, break_on_key) + "\n"
-            string += indent + "}"
+            write("\n" + indent + "{\n")
+            self._write_items(write, depth + 1, options)
+            write(indent + "}")
             
-            if index < len(self.parent.items) - 1:
-                string += "\n"
-        
-        return string
+            if index < len(siblings) - 1:
+                write("\n")
     
     def get_list(self) -> tuple:
         return (self.key, *self.values)  # need parenthesis for python versions older than 3.8
@@ -188,6 +238,9 @@ class QPCBlock(QPCBlockBase):
     def solve_condition(self, macros: dict):
         return solve_condition(self, self.condition, macros)
     
+    def solve_condition_mask(self, macros_list: list, mask: int) -> int:
+        return solve_condition_mask(self, self.condition, macros_list, mask)
+    
     def invalid_option(self, value: str, *valid_option_list):
         warning(self.get_file_info(), f"Invalid Option: {value}", "Valid Options:", *valid_option_list)
     
@@ -223,98 +276,166 @@ def replace_macros_condition(split_string, macros):
     return split_string
 
 
-def _print_solved_condition(split_string: list, result: int):
+# operator precedence for conditions, lowest number is solved first
+# the operators on each level are solved left to right
+COND_PRECEDENCE = {
+    "<": 0,
+    "<=": 1,
+    ">=": 2,
+    ">": 3,
+    "==": 4,  # you can compare stings with these 2
+    "!=": 5,
+    "&&": 6,
+    "||": 7,
+}
+
+COND_FUNCS = {
+    "<":  lambda left, right: 1 if int(left) < int(right) else 0,
+    "<=": lambda left, right: 1 if int(left) <= int(right) else 0,
+    ">=": lambda left, right: 1 if int(left) >= int(right) else 0,
+    ">":  lambda left, right: 1 if int(left) > int(right) else 0,
+    "==": lambda left, right: 1 if str(left) == str(right) else 0,
+    "!=": lambda left, right: 1 if str(left) != str(right) else 0,
+    "&&": lambda left, right: 1 if int(left) > 0 and int(right) > 0 else 0,
+    "||": lambda left, right: 1 if int(left) > 0 or int(right) > 0 else 0,
+}
+
+# compiled conditions, the same few hundred condition strings are solved over and over
+_CONDITION_CACHE = {}
+
+
+class ConditionError(Exception):
     pass
-    # verbose_color(Color.BLUE, f"Solved Condition: \"[{' '.join(split_string)}]\" -> \"{result}\"")
 
 
-def solve_condition(qpcblock: QPCBlockBase, condition: str, macros: dict) -> int:
-    if not condition:
-        return True
-    
-    solved_cond = condition
-    # solve any sub conditionals first
-    while "(" in solved_cond:
-        sub_cond_line = (solved_cond.split('(')[1]).split(')')[0]
-        sub_cond_value = solve_condition(qpcblock, sub_cond_line, macros)
-        solved_cond = solved_cond.split('(', 1)[0] + str(sub_cond_value * 1) + solved_cond.split(')', 1)[1]
-    
-    split_string = COND_OPERATORS.split(solved_cond)
-    
-    solved_cond = replace_macros_condition(split_string.copy(), macros)
-    
-    if len(solved_cond) == 1:
+def _compile_operand(item: str):
+    # same rules as replace_macros_condition, but decided once instead of every time it's solved
+    if item.startswith("!"):
+        macro = item[1:]
+        return lambda macros: "0" if macros.get(macro) else "1"
+    elif item.startswith("$"):
+        return lambda macros: macros.get(item, "0")
+    return lambda macros: macros.get(item, item)
+
+
+def _compile_group_operand(parts: list):
+    # plain parenthesis, nothing attached to them
+    if len(parts) == 3 and not parts[0] and not parts[2]:
+        sub_cond = parts[1]
+        return lambda macros: _solve_single(sub_cond, macros)
+    
+    # a sub condition is solved first, and it's value is put back into the condition in it's place
+    # so this has to be handled as a string like any other value, like "!(...)" always being true
+    def solve_group(macros):
+        item = "".join([part if type(part) == str else str(_solve_single(part, macros)) for part in parts])
+        return replace_macros_condition([item], macros)[0]
+    return solve_group
+
+
+def _compile_binary(operator: str, left, right):
+    func = COND_FUNCS[operator]
+    return lambda macros: func(left(macros), right(macros))
+
+
+def _solve_single(compiled: tuple, macros: dict):
+    is_single, solve = compiled
+    if is_single:
+        value = solve(macros)
         try:
-            solved_cond[0] = int(solved_cond[0])
+            return int(value)
         except ValueError:
-            _print_solved_condition(split_string, 1)
             return 1
+    return solve(macros)
+
+
+def _parse_condition(split_cond: list, index: int) -> tuple:
+    operands = []
+    operators = []
+    is_single = True
+    
+    while True:
+        # every even index is a value, every odd index is an operator
+        parts = [split_cond[index]]
+        while index + 1 < len(split_cond) and split_cond[index + 1] == "(":
+            sub_cond, index = _parse_condition(split_cond, index + 2)
+            if index >= len(split_cond) or split_cond[index] != ")":
+                raise ConditionError("Parenthesis does not close")
+            parts.extend((sub_cond, split_cond[index + 1]))
+            index += 1
+        
+        if len(parts) == 1:
+            operands.append(_compile_operand(parts[0]))
+        else:
+            operands.append(_compile_group_operand(parts))
+        
+        index += 1
+        if index >= len(split_cond) or split_cond[index] == ")":
+            break
+        
+        operator = split_cond[index]
+        if operator == "(":
+            raise ConditionError("Unexpected parenthesis")
+        
+        # solve anything before this that has a higher precedence
+        while operators and COND_PRECEDENCE[operators[-1]] <= COND_PRECEDENCE[operator]:
+            right = operands.pop()
+            operands.append(_compile_binary(operators.pop(), operands.pop(), right))
+        operators.append(operator)
+        is_single = False
+        index += 1
+    
+    while operators:
+        right = operands.pop()
+        operands.append(_compile_binary(operators.pop(), operands.pop(), right))
+    
+    return (is_single, operands[0]), index
+
+
+def compile_condition(condition: str) -> tuple:
+    if condition in _CONDITION_CACHE:
+        return _CONDITION_CACHE[condition]
     
-    while len(solved_cond) > 1:
-        try:
-            solved_cond = _solve_single_condition(solved_cond)
-        except Exception as F:
-            qpcblock.error(f'Error Solving Condition: {str(F)}\n'
-                           f'\tCondition: [{condition}] -> [{" ".join(solved_cond)}]\n')
-            return 0
-
-    _print_solved_condition(split_string, solved_cond[0])
-    return solved_cond[0]
-
-
-def _solve_single_condition(cond):
-    index = 1
-    result = 0
-    # highest precedence order
-    if "<" in cond:
-        index = cond.index("<")
-        if int(cond[index - 1]) < int(cond[index + 1]):
-            result = 1
-    
-    elif "<=" in cond:
-        index = cond.index("<=")
-        if int(cond[index - 1]) <= int(cond[index + 1]):
-            result = 1
-    
-    elif ">=" in cond:
-        index = cond.index(">=")
-        if int(cond[index - 1]) >= int(cond[index + 1]):
-            result = 1
-    
-    elif ">" in cond:
-        index = cond.index(">")
-        if int(cond[index - 1]) > int(cond[index + 1]):
-            result = 1
-    
-    # next in order of precedence, check equality
-    # you can compare stings with these 2
-    elif "==" in cond:
-        index = cond.index("==")
-        if str(cond[index - 1]) == str(cond[index + 1]):
-            result = 1
-    
-    elif "!=" in cond:
-        index = cond.index("!=")
-        if str(cond[index - 1]) != str(cond[index + 1]):
-            result = 1
-    
-    # and then, check for any &&'s
-    elif "&&" in cond:
-        index = cond.index("&&")
-        if int(cond[index - 1]) > 0 and int(cond[index + 1]) > 0:
-            result = 1
-    
-    # and finally, check for any ||'s
-    elif "||" in cond:
-        index = cond.index("||")
-        if int(cond[index - 1]) > 0 or int(cond[index + 1]) > 0:
-            result = 1
-    
-    cond[index] = result
-    del cond[index + 1]
-    del cond[index - 1]
+    split_cond = [item.strip() for item in COND_OPERATORS.split(condition)]
+    compiled, index = _parse_condition(split_cond, 0)
+    if index < len(split_cond):
+        raise ConditionError("Parenthesis closed without being opened")
     
-    return cond
+    _CONDITION_CACHE[condition] = compiled
+    return compiled
+
+
+def solve_condition(qpcblock: QPCBlockBase, condition: str, macros: dict) -> int:
+    if not condition:
+        return True
+    
+    try:
+        compiled = _CONDITION_CACHE.get(condition) or compile_condition(condition)
+        return _solve_single(compiled, macros)
+    except Exception as F:
+        qpcblock.error(f'Error Solving Condition: {str(F)}\n'
+                       f'\tCondition: [{condition}]\n')
+        return 0
+
+
+# solves a condition for multiple sets of macros at once, like every pass of a project
+# bit N of mask is set if macros_list[N] should be checked, returns the mask of the ones that pass
+def solve_condition_mask(qpcblock: QPCBlockBase, condition: str, macros_list: list, mask: int) -> int:
+    if not condition or not mask:
+        return mask
+    
+    try:
+        compiled = _CONDITION_CACHE.get(condition) or compile_condition(condition)
+        result = 0
+        bit = 1
+        for macros in macros_list:
+            if mask & bit and _solve_single(compiled, macros):
+                result |= bit
+            bit <<= 1
+        return result
+    except Exception as F:
+        qpcblock.error(f'Error Solving Condition: {str(F)}\n'
+                       f'\tCondition: [{condition}]\n')
+        return 0
 
 
 def add_spacing_to_condition(cond):
@@ -331,17 +452,54 @@ def add_spacing_to_condition(cond):
     return cond
 
 
-def read_file(path: str, keep_quotes: bool = False, allow_escapes: bool = True, multiline_quotes: bool = False) -> QPCBlockBase:
+# use_mmap: None picks by file size, see MMAP_MIN_SIZE
+# open_path: where to read the file from, if it's not path, like an absolute path when reading from another thread
+def read_file(path: str, keep_quotes: bool = False, allow_escapes: bool = True, multiline_quotes: bool = False,
+              use_mmap: bool = None, open_path: str = None) -> QPCBlockBase:
     path = posix_path(path)
-    lexer = QPCLexer(path, keep_quotes, allow_escapes, multiline_quotes)
+    open_path = posix_path(open_path) if open_path else path
     qpc_file = QPCBlockBase(path)
-    path = posix_path(os.getcwd() + "/" + path)
-    parse_recursive(lexer, qpc_file, path)
+    
+    if PARSE_CACHE.enabled:
+        options = (keep_quotes, allow_escapes, multiline_quotes)
+        tree = PARSE_CACHE.load(open_path, options)
+        if tree is not None:
+            tree_to_block(qpc_file, tree)
+            return qpc_file
+        stat = os.stat(open_path)
+        warning_count = qpc_logging.get_warning_count()
+    
+    if use_mmap is None:
+        use_mmap = os.path.getsize(open_path) >= MMAP_MIN_SIZE
+    
+    lexer = QPCLexer(open_path, keep_quotes, allow_escapes, multiline_quotes, use_mmap)
+    try:
+        parse_recursive(lexer, qpc_file, path)
+    finally:
+        lexer.close()
+    
+    # don't cache anything with warnings, they would only show up the first time
+    if PARSE_CACHE.enabled and warning_count == qpc_logging.get_warning_count():
+        PARSE_CACHE.store(open_path, options, stat, block_to_tree(qpc_file))
     return qpc_file
 
 
+# compact form of a QPCBlockBase for storing in the parse cache
+# each item is (key, values, condition, line_num, items)
+def block_to_tree(block: QPCBlockBase) -> tuple:
+    return tuple([(item.key, tuple(item.values), item.condition, item.line_num, block_to_tree(item))
+                  for item in block.items])
+
+
+def tree_to_block(block: QPCBlockBase, tree: tuple) -> None:
+    for key, values, condition, line_num, items in tree:
+        sub_block = block.add_item(key, list(values), condition, line_num)
+        if items:
+            tree_to_block(sub_block, items)
+
+
 def parse_recursive(lexer, block, path):
-    while lexer.char_num < lexer.file_len - 1:
+    while lexer.char_num < lexer.parse_end:
         key, line_num = lexer.next_key()
         
         if not key:
@@ -367,39 +525,174 @@ def parse_recursive(lexer, block, path):
             return
 
 
+# files at least this big are memory mapped and lexed as bytes, instead of being read into a string first
+MMAP_MIN_SIZE = 256 * 1024
+_UTF8_CHECK_CHUNK = 1024 * 1024
+
+
+# the characters and patterns the lexer looks for, as str for files read as text, or bytes for mapped files
+# single characters read from bytes are ints, so those have their own constants
+class LexerSyntax:
+    def __init__(self, convert, convert_char, convert_set, decode):
+        self.decode = decode
+        self.empty = convert("")
+        self.newline = convert("\n")
+        self.space = convert(" ")
+        self.tab = convert("\t")
+        self.backslash = convert("\\")
+        self.open_bracket = convert("[")
+        self.close_bracket = convert("]")
+        self.comment_end = convert("*/")
+        
+        self.char_newline = convert_char("\n")
+        self.char_backslash = convert_char("\\")
+        self.char_slash = convert_char("/")
+        self.char_star = convert_char("*")
+        self.char_close_bracket = convert_char("]")
+        
+        self.brackets = convert_set("[]")
+        self.braces = convert_set("{}")
+        self.spaces = convert_set(" \t")
+        self.whitespace = convert_set(" \t\n")
+        self.quotes = convert_set("\"'")
+        self.escapes = convert_set("'\"\\")
+        self.comments = convert_set("/*")
+        self.slashes = convert_set("\\/")
+        
+        # runs of characters that have no special meaning to the lexer, so they can be consumed in one match
+        # instead of one character at a time
+        self.re_space = compile(convert("[ \t]+"))
+        self.re_whitespace = compile(convert("[ \t\n]+"))
+        self.re_key_run = compile(convert("[^ \t\n{}\"'\\\\/]+"))
+        self.re_value_run = compile(convert("[^ \t\n{}\"'\\\\/\\[\\]]+"))
+        self.re_cond_run = compile(convert("[^\n{}\\]/]+"))
+        # a quote with nothing in it that needs handling, which is nearly all of them
+        self.re_quote_simple = {
+            convert_char('"'): compile(convert("[^\"\\\\\n]*\"")),
+            convert_char("'"): compile(convert("[^'\\\\\n]*'")),
+        }
+        self.re_quote_run = {
+            convert_char('"'): compile(convert("[^\"\\\\\n]+")),
+            convert_char("'"): compile(convert("[^'\\\\\n]+")),
+        }
+
+
+SYNTAX_TEXT = LexerSyntax(str, str, str, str)
+SYNTAX_BYTES = LexerSyntax(str.encode, ord, lambda chars: frozenset(chars.encode()), bytes.decode)
+
+
+def _is_utf8(data) -> bool:
+    decoder = getincrementaldecoder("utf-8")()
+    try:
+        for pos in range(0, len(data), _UTF8_CHECK_CHUNK):
+            decoder.decode(data[pos:pos + _UTF8_CHECK_CHUNK])
+        decoder.decode(b"", True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+# returns None if the file can't be lexed as bytes
+def _map_file(path: str):
+    with open(path, mode="rb") as file:
+        try:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            return None
+    
+    # anything not utf-8 uses the fallback encoding, which might not be ascii compatible,
+    # and text mode turns \r\n into \n, so read those files as text like before
+    if mapped.find(b"\r") != -1 or not _is_utf8(mapped):
+        mapped.close()
+        return None
+    return mapped
+
+
 class QPCLexer:
-    def __init__(self, path: str, keep_quotes: bool = False, allow_escapes: bool = True, multiline_quotes: bool = False):
+    def __init__(self, path: str, keep_quotes: bool = False, allow_escapes: bool = True, multiline_quotes: bool = False,
+                 use_mmap: bool = False):
         self.char_num = 0
         self.line_num = 1
-        self.line_char = 0
         self.path = path
         self.keep_quotes = keep_quotes
         self.allow_escapes = allow_escapes
         self.multiline_quotes = multiline_quotes
+        self._split_file = None
         
-        try:
-            with open(path, mode="r", encoding="utf-8") as file:
-                self.file = file.read()
-        except UnicodeDecodeError:
-            with open(path, mode="r", encoding="ansi") as file:
-                self.file = file.read()
-            
-        self.file_len = len(self.file) - 1
-        self.split_file = self.file.splitlines()
+        self.file = _map_file(path) if use_mmap else None
+        self.mapped = self.file is not None
         
-        self.chars_escape = {'\'', '"', '\\'}
-        self.chars_comment = {'/', '*'}
-        self.chars_item = {'{', '}'}
-        self.chars_cond = {'[', ']'}
-        self.chars_space = {' ', '\t'}
-        self.chars_quote = {'"', '\''}
-
+        if self.mapped:
+            self.syntax = SYNTAX_BYTES
+            # NOTE: nearly all scanning stops before the last character, this is how the reader always worked
+            # that's the last utf-8 character here, not the last byte
+            self.file_len = self._char_start(len(self.file) - 1)
+            self.parse_end = self._char_start(self.file_len - 1)
+        else:
+            self.syntax = SYNTAX_TEXT
+            try:
+                with open(path, mode="r", encoding="utf-8") as file:
+                    self.file = file.read()
+            except UnicodeDecodeError:
+                with open(path, mode="r", encoding="ansi") as file:
+                    self.file = file.read()
+            self.file_len = len(self.file) - 1
+            self.parse_end = self.file_len - 1
+    
+    def close(self):
+        if self.mapped:
+            self.file.close()
+    
+    # only made when a warning needs to print the line
+    @property
+    def split_file(self) -> list:
+        if self._split_file is None:
+            text = self.file[:] if self.mapped else self.file
+            self._split_file = self.syntax.decode(text).splitlines()
+        return self._split_file
+    
+    # character offset of a position in the file, which isn't the same as the byte offset in a mapped file
+    def _text_offset(self, pos: int) -> int:
+        if self.mapped:
+            return len(self.file[:pos].decode())
+        return pos
+    
+    @property
+    def line_char(self) -> int:
+        return self._column(self.char_num)
+    
+    def _column(self, char_num: int) -> int:
+        line_start = self.file.rfind(self.syntax.newline, 0, char_num)
+        if self.mapped:
+            return len(self.file[line_start + 1:char_num].decode()) + 1
+        return char_num - line_start
+    
+    # start of the utf-8 character the byte at pos is in
+    def _char_start(self, pos: int) -> int:
+        while pos > 0 and self.file[pos] & 0xC0 == 0x80:
+            pos -= 1
+        return pos
+    
+    # where the character starting at pos ends, utf-8 characters in mapped files can be more than one byte
+    def _char_end(self, pos: int) -> int:
+        if self.mapped:
+            lead = self.file[pos]
+            return pos + (1 if lead < 0x80 else 2 if lead < 0xE0 else 3 if lead < 0xF0 else 4)
+        return pos + 1
+    
+    def _count_lines(self, start: int, end: int) -> int:
+        if self.mapped:
+            return self.file[start:end].count(b"\n")
+        return self.file.count("\n", start, end)
+    
     def formatted_info(self) -> str:
-        return f"File \"{self.path}\" : Line {str(self.line_num)} : Char {self.char_num}"
+        return f"File \"{self.path}\" : Line {str(self.line_num)} : Char {self._text_offset(self.char_num)}"
     
     def get_current_line(self) -> str:
         if -1 < self.line_num <= self.file_len:
-            return self.split_file[self.line_num - 1]
+            split_file = self.split_file
+            if self.line_num - 1 < len(split_file):
+                return split_file[self.line_num - 1]
         return ""
     
     @staticmethod
@@ -412,231 +705,283 @@ class QPCLexer:
         warning_no_line(self.formatted_info(), *text)
         print(self.get_current_line().replace("\t", " "))
         print_color(Color.GREEN, file_error)
-        
-    def next_line(self):
-        self.line_num += 1
-        self.line_char = 0
-        
-    def next_char(self, amount: int = 1):
-        self.char_num += amount
-        self.line_char += amount
+    
+    def _is_escape(self, pos: int) -> bool:
+        return pos + 1 < self.file_len and self.file[pos + 1] in self.syntax.escapes
+    
+    def _is_comment(self, pos: int) -> bool:
+        return pos + 1 < self.file_len and self.file[pos + 1] in self.syntax.comments
     
     def next_value_list(self):
-        start = self.line_char
+        syntax = self.syntax
+        text = self.file
+        end = self.file_len
+        pos = self.char_num
+        start = pos
         values = []
-        current_value = ''
-        while self.char_num < self.file_len:
-            char = self.file[self.char_num]
+        current_value = syntax.empty
+        while pos < end:
+            char = text[pos]
             
-            if char in self.chars_item:
+            if char in syntax.braces:
                 break
             
-            if char in self.chars_space:
-                if current_value:
-                    if current_value != '\\':
-                        values.append(current_value)
-                        current_value = ''
-                self.next_char()
-                start = self.line_char
+            if char in syntax.spaces:
+                if current_value and current_value != syntax.backslash:
+                    values.append(syntax.decode(current_value))
+                    current_value = syntax.empty
+                pos = start = syntax.re_space.match(text, pos, end).end()
                 continue
             
-            if char in {'"', '\''}:
-                if current_value and current_value != "\\":
-                    self.warning_range(start, self.line_char - start,
+            if char in syntax.quotes:
+                self.char_num = pos
+                if current_value and current_value != syntax.backslash:
+                    self.warning_range(self._column(start), len(syntax.decode(text[start:pos])),
                                        "Opening a quote inside a string, using quote only")
                 values.append(self.read_quote(char))
-                current_value = ""
-                start = self.line_char
+                current_value = syntax.empty
+                pos = start = self.char_num
                 continue
             
             # skip escape
-            if char == '\\' and self.peek_char() in self.chars_escape:
-                self.next_char(2)
-                current_value += self.file[self.char_num]
-                # char = self.file[self.char_num]
-            
-            elif char == '\n':
-                if not current_value.endswith("\\"):
-                    if current_value and not current_value.startswith('[') and not current_value.endswith(']'):
-                        values.append(current_value)
+            if char == syntax.char_backslash and self._is_escape(pos):
+                char_end = self._char_end(pos + 2)
+                current_value += text[pos + 2:char_end]
+                pos = char_end
+            
+            elif char == syntax.char_newline:
+                if not current_value.endswith(syntax.backslash):
+                    if current_value and not current_value.startswith(syntax.open_bracket) and \
+                            not current_value.endswith(syntax.close_bracket):
+                        values.append(syntax.decode(current_value))
                     break
-                else:
-                    self.next_line()
-                    start = 0
+                self.line_num += 1
+                pos += 1
+                start = pos
             
-            elif char == '/' and self.peek_char() in self.chars_comment:
+            elif char == syntax.char_slash and self._is_comment(pos):
+                self.char_num = pos
                 self.skip_comment()
+                pos = self.char_num + 1
             
-            else:
-                if self.file[self.char_num] in self.chars_cond:
-                    break
-                if current_value == '\\':
-                    current_value = ''
-                current_value += self.file[self.char_num]
+            elif char in syntax.brackets:
+                break
             
-            self.next_char()
+            else:
+                if current_value == syntax.backslash:
+                    current_value = syntax.empty
+                if char in syntax.slashes:
+                    current_value += text[pos:pos + 1]
+                    pos += 1
+                else:
+                    match = syntax.re_value_run.match(text, pos, end)
+                    current_value += match.group()
+                    pos = match.end()
         
+        self.char_num = pos
         return values
     
     def peek_char(self):
         if self.char_num + 1 >= self.file_len:
             return None
-        return self.file[self.char_num + 1]
+        return self.syntax.decode(self.file[self.char_num + 1:self._char_end(self.char_num + 1)])
     
     # used to be NextString, but i only used it for keys
     def next_key(self):
-        string = ""
-        line_num = 0
-        skip_list = {' ', '\t', '\n'}
+        syntax = self.syntax
+        text = self.file
+        end = self.file_len
+        pos = self.char_num
+        string = syntax.empty
         
-        while self.char_num < self.file_len:
-            char = self.file[self.char_num]
+        while pos < end:
+            char = text[pos]
             
-            if char in self.chars_item:
-                line_num = self.line_num
+            if char in syntax.braces:
                 break
             
-            elif char in self.chars_space:
+            elif char in syntax.whitespace:
                 if string:
-                    line_num = self.line_num
                     break
+                match = syntax.re_whitespace.match(text, pos, end)
+                self.line_num += self._count_lines(pos, match.end())
+                pos = match.end()
             
-            elif char in self.chars_quote:
-                string = self.read_quote(char)
-                line_num = self.line_num
-                break
+            elif char in syntax.quotes:
+                self.char_num = pos
+                return self.read_quote(char), self.line_num
             
             # skip escape
-            elif char == '\\' and self.peek_char() in self.chars_escape:
-                self.next_char(2)
-                string += self.file[self.char_num]
-                # char = self.file[self.char_num]
+            elif char == syntax.char_backslash and self._is_escape(pos):
+                char_end = self._char_end(pos + 2)
+                string += text[pos + 2:char_end]
+                pos = char_end
             
-            elif char in skip_list:
-                if string:
-                    line_num = self.line_num
-                    break
-                if char == '\n':
-                    self.next_line()
-            
-            elif char == '/' and self.peek_char() in self.chars_comment:
+            elif char == syntax.char_slash and self._is_comment(pos):
+                self.char_num = pos
                 self.skip_comment()
+                pos = self.char_num + 1
             
-            else:
-                string += self.file[self.char_num]
+            elif char in syntax.slashes:
+                string += text[pos:pos + 1]
+                pos += 1
             
-            self.next_char()
+            else:
+                match = syntax.re_key_run.match(text, pos, end)
+                string += match.group()
+                pos = match.end()
+        else:
+            # ran off the end of the file without finishing the key
+            self.char_num = pos
+            return syntax.decode(string), 0
         
-        return string, line_num
+        self.char_num = pos
+        return syntax.decode(string), self.line_num
     
     def next_symbol(self):
-        while self.char_num <= self.file_len:
-            char = self.file[self.char_num]
+        syntax = self.syntax
+        text = self.file
+        end = self.file_len
+        pos = self.char_num
+        while pos <= end:
+            char = text[pos]
             
-            if char in self.chars_item:
-                self.next_char()
-                return char
+            if char in syntax.braces:
+                self.char_num = pos + 1
+                return syntax.decode(text[pos:pos + 1])
             
             # skip escape
-            elif char == '\\' and self.peek_char() in self.chars_escape:
-                self.next_char(2)
+            elif char == syntax.char_backslash and self._is_escape(pos):
+                pos = self._char_end(pos + 2)
             
-            elif char == '/' and self.peek_char() in self.chars_comment:
+            elif char == syntax.char_slash and self._is_comment(pos):
+                self.char_num = pos
                 self.skip_comment()
+                pos = self.char_num + 1
             
-            elif char == '\n':
-                self.next_line()
+            elif char == syntax.char_newline:
+                self.line_num += 1
+                pos += 1
             
-            elif char not in self.chars_space:
-                break
+            elif char in syntax.spaces:
+                pos = syntax.re_space.match(text, pos).end()
             
-            self.next_char()
+            else:
+                break
         
+        self.char_num = pos
         return None
     
     def next_condition(self):
-        condition = ''
-        while self.char_num < self.file_len:
-            char = self.file[self.char_num]
-            
-            if char in self.chars_item:
+        syntax = self.syntax
+        text = self.file
+        end = self.file_len
+        pos = self.char_num
+        condition = syntax.empty
+        while pos < end:
+            char = text[pos]
+            
+            if char in syntax.braces:
                 break
             
-            elif char == '[':
-                self.next_char()
-                continue
-            
-            elif char == ']':
-                self.next_char()
+            elif char == syntax.char_close_bracket:
+                pos += 1
                 break
             
-            elif char in self.chars_space:
-                self.next_char()
-                continue
-            
-            elif char == '\n':
-                self.next_line()
-                self.next_char()
+            elif char == syntax.char_newline:
+                self.line_num += 1
+                pos += 1
                 break
             
-            elif char == '/' and self.peek_char() in self.chars_comment:
-                self.skip_comment()
+            elif char == syntax.char_slash:
+                if self._is_comment(pos):
+                    self.char_num = pos
+                    self.skip_comment()
+                    pos = self.char_num + 1
+                else:
+                    condition += text[pos:pos + 1]
+                    pos += 1
             
             else:
-                condition += self.file[self.char_num]
-            
-            self.next_char()
+                # spaces and opening brackets are dropped from conditions
+                match = syntax.re_cond_run.match(text, pos, end)
+                condition += match.group().replace(syntax.space, syntax.empty).replace(
+                    syntax.tab, syntax.empty).replace(syntax.open_bracket, syntax.empty)
+                pos = match.end()
         
-        return condition
+        self.char_num = pos
+        return syntax.decode(condition)
     
+    # leaves char_num on the last character of the comment, like the newline for line comments
     def skip_comment(self):
-        self.next_char()
-        char = self.file[self.char_num]
-        if char == '/':
+        syntax = self.syntax
+        text = self.file
+        end = self.file_len
+        pos = self.char_num + 1
+        char = text[pos]
+        
+        if char == syntax.char_slash:
             # keep going until \n
-            while self.char_num < self.file_len:
-                self.next_char()
-                if self.file[self.char_num] == "\n":
-                    self.next_line()
-                    break
+            newline = text.find(syntax.newline, pos + 1, end + 1)
+            if newline != -1:
+                self.line_num += 1
+                self.char_num = newline
+            else:
+                self.char_num = max(pos, end)
         
-        elif char == '*':
-            while self.char_num < self.file_len:
-                char = self.file[self.char_num]
-                
-                if char == '*' and self.peek_char() == '/':
-                    self.next_char()
-                    break
-                
-                if char == "\n":
-                    self.next_line()
-                
-                self.next_char()
+        elif char == syntax.char_star:
+            comment_end = text.find(syntax.comment_end, pos, end)
+            if comment_end != -1:
+                self.line_num += self._count_lines(pos, comment_end)
+                self.char_num = comment_end + 1
+            else:
+                self.line_num += self._count_lines(pos, end)
+                self.char_num = max(pos, end)
     
     def read_quote(self, quote_char):
-        start = self.line_char
+        syntax = self.syntax
+        text = self.file
+        end = self.file_len
+        pos = self.char_num
+        start = pos
+        quote_str = text[pos:pos + 1]
         
-        if self.keep_quotes:
-            quote = quote_char
-        else:
-            quote = ''
+        match = syntax.re_quote_simple[quote_char].match(text, pos + 1)
+        if match:
+            self.char_num = match.end()
+            if self.keep_quotes:
+                return syntax.decode(quote_str + match.group(0))
+            return syntax.decode(match.group(0)[:-1])
         
-        while self.char_num < self.file_len:
-            self.next_char()
-            char = self.file[self.char_num]
-            
-            if char == '\\' and self.peek_char() in self.chars_escape and self.allow_escapes:
-                quote += self.peek_char()
-                self.next_char()
+        quote_run = syntax.re_quote_run[quote_char]
+        
+        quote = [quote_str] if self.keep_quotes else []
+        
+        while pos < end:
+            pos += 1
+            char = text[pos]
+            
+            if char == syntax.char_backslash:
+                if self.allow_escapes and self._is_escape(pos):
+                    pos += 1
+                    quote.append(text[pos:pos + 1])
+                else:
+                    quote.append(syntax.backslash)
             elif char == quote_char:
                 if self.keep_quotes:
-                    quote += char
-                break
-            elif char == "\n" and not self.multiline_quotes:
-                self.warning_range(start, self.line_char - start, "Quote does not end on line")
+                    quote.append(quote_str)
                 break
+            elif char == syntax.char_newline:
+                if not self.multiline_quotes:
+                    self.char_num = pos
+                    self.warning_range(self._column(start), len(syntax.decode(text[start:pos])),
+                                       "Quote does not end on line")
+                    break
+                quote.append(syntax.newline)
             else:
-                quote += char
+                match = quote_run.match(text, pos)
+                quote.append(match.group())
+                pos = match.end() - 1
         
-        self.next_char()
-        return quote
+        self.char_num = pos + 1
+        return syntax.decode(syntax.empty.join(quote))
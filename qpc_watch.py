@@ -0,0 +1,119 @@
+# --watch: after the first run, qpc keeps running and polls the modified time of every file the base files and
+# projects were made from, when any of them change, only the projects using them are parsed and created again
+#
+# the files of a project come from its hash file: the scripts and includes it read, and the directories its
+# glob_files patterns search, since adding or removing a file changes the modified time of the directory it's in
+
+import os
+from time import sleep
+from qpc_args import args
+from qpc_base import posix_path, check_file_path_glob
+import qpc_hash
+
+
+def get_mtime(path: str):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+# directories that files matching a glob pattern could be added to, if the pattern has wildcards in its directories,
+# like "src/**/*.cpp", every directory under the part without them is used
+def get_glob_dirs(pattern: str) -> list:
+    parts = posix_path(pattern).split("/")[:-1]
+    base_parts = []
+    for part in parts:
+        if check_file_path_glob(part):
+            break
+        base_parts.append(part)
+
+    base_dir = os.path.normpath("/".join(base_parts) or "/")
+    if len(base_parts) == len(parts):
+        return [base_dir]
+
+    glob_dirs = [base_dir]
+    for directory, dir_names, file_names in os.walk(base_dir):
+        glob_dirs.extend([os.path.join(directory, dir_name) for dir_name in dir_names])
+    return glob_dirs
+
+
+class Watcher:
+    def __init__(self):
+        # absolute path: modified time, None if it doesn't exist
+        self.mtimes = {}
+        self.base_files = set()
+        # absolute path: project scripts using it
+        self.project_files = {}
+        # project script: absolute paths it uses
+        self._files_by_project = {}
+
+    def _watch(self, path: str) -> None:
+        if path not in self.mtimes:
+            self.mtimes[path] = get_mtime(path)
+
+    def _unwatch(self, path: str) -> None:
+        if path not in self.base_files and path not in self.project_files:
+            self.mtimes.pop(path, None)
+
+    # absolute paths of every file read while parsing the base files
+    def set_base_files(self, base_files) -> None:
+        old_files, self.base_files = self.base_files, set(base_files)
+        [self._unwatch(path) for path in old_files]
+        [self._watch(path) for path in self.base_files]
+
+    # call after the hash file of a project was written, or found to be up to date
+    # files it still uses keep their modified time from before, so changes made while it was created aren't missed
+    def set_project(self, project_script: str) -> None:
+        root_paths = qpc_hash.get_root_paths()
+        scripts, glob_files = qpc_hash.get_hashed_files(project_script)
+
+        # the script is watched even if there's no hash, so it's parsed again when it's created
+        files = {root_paths.abspath(project_script)}
+        files.update([root_paths.abspath(script) for script in scripts])
+        [files.update(get_glob_dirs(root_paths.abspath(glob_file))) for glob_file in glob_files]
+
+        old_files = self._files_by_project.get(project_script, set())
+        self._files_by_project[project_script] = files
+        self._remove_files(project_script, old_files - files)
+        for path in files - old_files:
+            self.project_files.setdefault(path, set()).add(project_script)
+            self._watch(path)
+
+    # projects that aren't in project_scripts anymore are removed
+    def set_projects(self, project_scripts: list) -> None:
+        [self.remove_project(project_script) for project_script in set(self._files_by_project) - set(project_scripts)]
+        [self.set_project(project_script) for project_script in project_scripts]
+
+    def remove_project(self, project_script: str) -> None:
+        self._remove_files(project_script, self._files_by_project.pop(project_script, ()))
+
+    def _remove_files(self, project_script: str, files) -> None:
+        for path in files:
+            projects = self.project_files[path]
+            projects.discard(project_script)
+            if not projects:
+                del self.project_files[path]
+            self._unwatch(path)
+
+    # returns the files that changed since the last call
+    def poll(self) -> set:
+        changed_files = set()
+        for path, mtime in self.mtimes.items():
+            new_mtime = get_mtime(path)
+            if new_mtime != mtime:
+                self.mtimes[path] = new_mtime
+                changed_files.add(path)
+        return changed_files
+
+    def wait(self) -> set:
+        while True:
+            changed_files = self.poll()
+            if changed_files:
+                return changed_files
+            sleep(args.watch)
+
+    def get_projects(self, changed_files: set) -> set:
+        projects = set()
+        [projects.update(self.project_files.get(path, ())) for path in changed_files]
+        return projects